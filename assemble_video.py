@@ -0,0 +1,161 @@
+"""Assemble the final explainer video: title slide fade + image + narration.
+
+Python replacement for ``assemble_video.sh`` built on ffmpeg-python. Static
+slides are encoded with ``-tune stillimage`` at a low frame rate, and each
+slide is rendered once into a pre-scaled 1280x720 clip that is cached on disk
+(keyed by image content, duration and profile) and reused across runs. The
+final step only concatenates the cached clips and muxes the audio.
+
+Usage:
+    python assemble_video.py [--image ai_explained.png] [--audio tts_audio.wav]
+                             [--output output_video.mp4] [--profile final|preview]
+"""
+import argparse
+import hashlib
+import os
+import tempfile
+
+import ffmpeg
+
+from audio import concat_wavs, duration, encode_aac, file_digest, normalization_gains
+from image_sink import TARGET_SIZE, image_size
+from metrics import event, span
+
+TITLE_SLIDE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "title_slide.png")
+TITLE_DURATION = 5
+FADE_DURATION = 1
+WIDTH, HEIGHT = TARGET_SIZE
+
+CLIP_CACHE_DIR = os.getenv("CLIP_CACHE_DIR", ".clip_cache")
+
+# Static slides barely change frame to frame, so a low frame rate and the
+# stillimage tune cut encoding time without visible quality loss.
+PROFILES = {
+    "preview": {"r": 10, "preset": "ultrafast", "crf": 30, "tune": "stillimage"},
+    "final": {"r": 24, "preset": "medium", "crf": 20, "tune": "stillimage"},
+}
+
+
+def probe_duration(path):
+    """Media duration in seconds; WAVs are read from the header, no ffprobe."""
+    return duration(path)
+
+
+def scale_to_frame(video, image):
+    """Scale to the output frame unless the image is already presized."""
+    if image_size(image) == (WIDTH, HEIGHT):
+        return video
+    return video.filter("scale", WIDTH, HEIGHT)
+
+
+def slide_clip(image, duration, profile, fade_out=None, cache_dir=CLIP_CACHE_DIR):
+    """Render ``image`` into a cached 1280x720 H.264 clip of ``duration`` seconds."""
+    settings = PROFILES[profile]
+    key = hashlib.sha256(
+        f"{file_digest(image)}|{duration:.3f}|{fade_out}|{profile}|{sorted(settings.items())}".encode()
+    ).hexdigest()[:32]
+    os.makedirs(cache_dir, exist_ok=True)
+    clip = os.path.join(cache_dir, f"{key}.mp4")
+    if os.path.exists(clip):
+        event("ffmpeg_slide", profile=profile, cache="hit")
+        return clip
+
+    video = scale_to_frame(ffmpeg.input(image, loop=1, t=duration, framerate=settings["r"]), image)
+    if fade_out:
+        video = video.filter("fade", t="out", st=duration - fade_out, d=fade_out)
+    video = video.filter("format", "yuv420p")
+
+    # Render to a temp name first so an interrupted encode is never reused
+    tmp = clip + ".part.mp4"
+    with span("ffmpeg_slide", profile=profile, cache="miss", duration_media_s=round(duration, 2)) as sp:
+        (
+            ffmpeg.output(
+                video, tmp,
+                vcodec="libx264", preset=settings["preset"], crf=settings["crf"],
+                tune=settings["tune"], r=settings["r"], an=None,
+            )
+            .overwrite_output()
+            .run(quiet=True)
+        )
+        os.replace(tmp, clip)
+        sp.set(response_bytes=os.path.getsize(clip))
+    return clip
+
+
+def concat_with_audio(clips, audio, output):
+    """Concatenate identically encoded clips (stream copy) and mux ``audio`` as AAC.
+
+    Already-encoded AAC audio (``.m4a``, see ``audio.encode_aac``) is stream-copied too.
+    """
+    acodec = "copy" if audio.lower().endswith((".m4a", ".aac")) else "aac"
+    with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as f:
+        for clip in clips:
+            f.write(f"file '{os.path.abspath(clip)}'\n")
+        list_path = f.name
+    try:
+        video = ffmpeg.input(list_path, f="concat", safe=0)
+        sound = ffmpeg.input(audio)
+        with span("ffmpeg_mux", clips=len(clips)) as sp:
+            (
+                ffmpeg.output(video.video, sound.audio, output, vcodec="copy", acodec=acodec, shortest=None)
+                .overwrite_output()
+                .run(quiet=True)
+            )
+            sp.set(response_bytes=os.path.getsize(output))
+    finally:
+        os.remove(list_path)
+    return output
+
+
+def join_narration(paths, cache_dir=CLIP_CACHE_DIR):
+    """One WAV from several narration parts, each brought to the common level."""
+    if len(paths) == 1:
+        return paths[0]
+    gains = normalization_gains(paths)
+    key = hashlib.sha256(
+        "|".join(f"{file_digest(p)}:{g:.4f}" for p, g in zip(paths, gains)).encode()
+    ).hexdigest()[:32]
+    os.makedirs(cache_dir, exist_ok=True)
+    joined = os.path.join(cache_dir, f"narration-{key}.wav")
+    if not os.path.exists(joined):
+        concat_wavs(paths, joined, gains)
+    return joined
+
+
+def assemble(image, audio, output, profile="final", title=TITLE_SLIDE, aac_cache=False):
+    """Build ``output`` from the title slide, ``image`` and narration ``audio``.
+
+    ``audio`` may be a list of WAV parts; they are joined and level-matched.
+    With ``aac_cache`` the narration is encoded to AAC once and reused by
+    later assemblies (e.g. preview, then final), which then only stream-copy.
+    """
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown profile {profile!r}; choose from {', '.join(PROFILES)}")
+    if isinstance(audio, (list, tuple)):
+        audio = join_narration(list(audio))
+    clips = []
+    if title and os.path.exists(title):
+        clips.append(slide_clip(title, TITLE_DURATION, profile, fade_out=FADE_DURATION))
+    clips.append(slide_clip(image, probe_duration(audio), profile))
+    if aac_cache:
+        audio = encode_aac(audio, CLIP_CACHE_DIR)
+    return concat_with_audio(clips, audio, output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Assemble the explainer video.")
+    parser.add_argument("--image", default="ai_explained.png")
+    parser.add_argument("--audio", action="append",
+                        help="Narration WAV (default tts_audio.wav); repeat to join several parts")
+    parser.add_argument("--output", default="output_video.mp4")
+    parser.add_argument("--profile", default="final", choices=sorted(PROFILES))
+    parser.add_argument("--aac-cache", action="store_true",
+                        help="Encode the narration to AAC once and stream-copy it on later runs")
+    args = parser.parse_args()
+
+    assemble(args.image, args.audio or ["tts_audio.wav"], args.output, args.profile, aac_cache=args.aac_cache)
+    print(f"Final video: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
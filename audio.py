@@ -0,0 +1,218 @@
+"""Narration audio helpers that never hold a whole track in memory.
+
+- ``wav_duration()`` reads the length from the WAV header (frames / rate),
+  so assembling a video no longer spawns ffprobe for the narration.
+- ``open_pcm()`` memory-maps a WAV and exposes its PCM samples; ``levels()``,
+  ``concat_wavs()`` and ``normalize_levels()`` walk that mapping in fixed-size
+  blocks, so RSS stays flat however long the narration is.
+- ``encode_aac()`` encodes a WAV to AAC once and caches the result, so the
+  final mux can stream-copy the audio instead of re-encoding it every time.
+
+All narration is 16-bit mono PCM at 24 kHz, the Gemini TTS output format.
+"""
+import hashlib
+import math
+import mmap
+import os
+import struct
+import subprocess
+import sys
+import wave
+from array import array
+from collections import namedtuple
+from contextlib import contextmanager
+
+SAMPLE_RATE = 24000
+SAMPLE_WIDTH = 2
+CHANNELS = 1
+
+# AAC settings shared by the assembler and timeline clips, so clips built
+# from pre-encoded narration can be concatenated with a stream copy
+AAC_BITRATE = "128k"
+AAC_CACHE_DIR = os.getenv("CLIP_CACHE_DIR", ".clip_cache")
+
+# Samples processed per step when scanning or rewriting PCM
+BLOCK_SAMPLES = 1 << 16
+
+# Every narration is brought to this RMS level on its own, so a segment's
+# normalized audio never depends on the other segments
+NORMALIZE_TARGET_DBFS = float(os.getenv("NORMALIZE_TARGET_DBFS", "-20"))
+
+# Narration within this many dB of the target is left untouched
+NORMALIZE_TOLERANCE_DB = 0.5
+
+WavFormat = namedtuple("WavFormat", "channels rate width")
+
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def wav_duration(path):
+    """Duration in seconds from the WAV header."""
+    with wave.open(path, "rb") as wf:
+        return wf.getnframes() / float(wf.getframerate())
+
+
+def duration(path):
+    """Duration of ``path``: from the header for WAVs, via ffprobe otherwise."""
+    try:
+        return wav_duration(path)
+    except (wave.Error, EOFError):
+        import ffmpeg
+
+        return float(ffmpeg.probe(path)["format"]["duration"])
+
+
+@contextmanager
+def wav_writer(path, rate=SAMPLE_RATE, channels=CHANNELS, width=SAMPLE_WIDTH):
+    """Open ``path`` for streaming PCM writes (``writeframes`` per chunk)."""
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(channels)
+        wf.setsampwidth(width)
+        wf.setframerate(rate)
+        yield wf
+
+
+def _pcm_span(data):
+    """(WavFormat, offset, size) of the PCM data chunk in a RIFF/WAVE buffer."""
+    if data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        raise ValueError("Not a WAV file")
+    fmt, pos = None, 12
+    while pos + 8 <= len(data):
+        chunk_id = bytes(data[pos:pos + 4])
+        size = int.from_bytes(data[pos + 4:pos + 8], "little")
+        body = pos + 8
+        if chunk_id == b"fmt ":
+            _, channels, rate, _, _, bits = struct.unpack("<HHIIHH", data[body:body + 16])
+            fmt = WavFormat(channels, rate, bits // 8)
+        elif chunk_id == b"data":
+            if fmt is None:
+                break
+            # A writer that died before fixing the header leaves size unset
+            return fmt, body, min(size, len(data) - body) or len(data) - body
+        pos = body + size + (size & 1)
+    raise ValueError("WAV file has no fmt/data chunk")
+
+
+@contextmanager
+def open_pcm(path):
+    """Memory-map ``path``; yields (WavFormat, memoryview of its PCM bytes)."""
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        view = memoryview(mm)
+        try:
+            fmt, offset, size = _pcm_span(view)
+            pcm = view[offset:offset + size]
+            try:
+                yield fmt, pcm
+            finally:
+                pcm.release()
+        finally:
+            view.release()
+
+
+def _blocks(pcm, width):
+    step = BLOCK_SAMPLES * width
+    usable = len(pcm) - len(pcm) % width
+    for start in range(0, usable, step):
+        samples = array("h")
+        samples.frombytes(pcm[start:min(start + step, usable)])
+        if sys.byteorder == "big":
+            samples.byteswap()
+        yield samples
+
+
+def levels(path):
+    """(RMS dBFS, peak sample) of a 16-bit WAV, scanned block by block."""
+    with open_pcm(path) as (fmt, pcm):
+        if fmt.width != 2:
+            raise ValueError(f"{path}: only 16-bit PCM is supported")
+        total, count, peak = 0, 0, 0
+        for samples in _blocks(pcm, fmt.width):
+            total += sum(s * s for s in samples)
+            count += len(samples)
+            peak = max(peak, max(samples), -min(samples))
+    if not total:
+        return -math.inf, peak
+    return 10 * math.log10(total / count / 32768 ** 2), peak
+
+
+def _write_scaled(pcm, width, gain, out):
+    if gain == 1.0:
+        for start in range(0, len(pcm), BLOCK_SAMPLES * width):
+            out.writeframesraw(pcm[start:start + BLOCK_SAMPLES * width])
+        return
+    for samples in _blocks(pcm, width):
+        scaled = array("h", (max(-32768, min(32767, round(s * gain))) for s in samples))
+        if sys.byteorder == "big":
+            scaled.byteswap()
+        out.writeframesraw(scaled.tobytes())
+
+
+def concat_wavs(paths, output, gains=None):
+    """Join WAVs with matching formats into ``output``, optionally applying per-file gains."""
+    gains = gains or [1.0] * len(paths)
+    with wave.open(paths[0], "rb") as wf:
+        first = WavFormat(wf.getnchannels(), wf.getframerate(), wf.getsampwidth())
+    tmp = output + ".part.wav"
+    with wav_writer(tmp, first.rate, first.channels, first.width) as out:
+        for path, gain in zip(paths, gains):
+            with open_pcm(path) as (fmt, pcm):
+                if fmt != first:
+                    raise ValueError(f"{path}: format {fmt} does not match {first}")
+                _write_scaled(pcm, fmt.width, gain, out)
+    os.replace(tmp, output)
+    return output
+
+
+def normalization_gain(path, target=NORMALIZE_TARGET_DBFS):
+    """Gain that brings ``path`` to ``target`` dBFS RMS without clipping."""
+    db, peak = levels(path)
+    if db == -math.inf or abs(target - db) <= NORMALIZE_TOLERANCE_DB:
+        return 1.0
+    gain = 10 ** ((target - db) / 20)
+    return min(gain, 32767 / peak) if peak else gain
+
+
+def normalization_gains(paths, target=NORMALIZE_TARGET_DBFS):
+    """Per-file gains; each file is measured against ``target`` independently."""
+    return [normalization_gain(path, target) for path in paths]
+
+
+def normalize_levels(paths, out_dir):
+    """Bring each narration segment to the common target; returns paths (originals where no change was needed)."""
+    os.makedirs(out_dir, exist_ok=True)
+    result = []
+    for path, gain in zip(paths, normalization_gains(paths)):
+        if gain == 1.0:
+            result.append(path)
+            continue
+        # Keyed by content: a WAV regenerated at the same path gets a new file
+        normalized = os.path.join(out_dir, f"norm-{file_digest(path)[:32]}-{gain:.4f}.wav")
+        if not os.path.exists(normalized):
+            concat_wavs([path], normalized, [gain])
+        result.append(normalized)
+    return result
+
+
+def encode_aac(wav, cache_dir=AAC_CACHE_DIR):
+    """AAC (.m4a) copy of ``wav``, encoded once and reused while the WAV is unchanged."""
+    st = os.stat(wav)
+    key = f"{os.path.abspath(wav)}|{st.st_size}|{st.st_mtime_ns}|{AAC_BITRATE}"
+    os.makedirs(cache_dir, exist_ok=True)
+    out = os.path.join(cache_dir, f"aac-{hashlib.sha256(key.encode()).hexdigest()[:32]}.m4a")
+    if os.path.exists(out):
+        return out
+    tmp = out + ".part.m4a"
+    subprocess.run(
+        ["ffmpeg", "-y", "-v", "error", "-i", wav, "-c:a", "aac", "-ar", str(SAMPLE_RATE),
+         "-ac", str(CHANNELS), "-b:a", AAC_BITRATE, tmp],
+        check=True,
+    )
+    os.replace(tmp, out)
+    return out
+
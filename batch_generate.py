@@ -0,0 +1,167 @@
+"""Batch entry point: generate one explainer video per topic in a manifest.
+
+Manifest formats:
+- JSONL: one object per line, e.g. {"id": "ai", "topic": "Artificial Intelligence"}
+- CSV:   header row with at least a ``topic`` column
+
+Optional fields per job: ``id`` (output folder name, defaults to a slug of the
+topic), ``prompt`` (FLASH prompt) and ``image_prompt`` (FLUX fallback prompt).
+
+Every job writes into ``<out-root>/<id>/`` and records finished stages in its
+``state.json``, so re-running the same command after a crash picks up where
+each job stopped.
+
+With ``--segments N`` each job is planned instead (``planner.py``): one
+Gemini call writes an N-segment script, and the video is rendered as a
+multi-segment timeline.
+
+Usage:
+    python batch_generate.py topics.jsonl --workers 4 --gemini-rpm 10
+    python batch_generate.py topics.jsonl --segments 4 --seconds 150
+"""
+import argparse
+import csv
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import rate_limit
+from assemble_video import PROFILES, assemble as assemble_video
+from generate_media import (
+    AUDIO_PATH,
+    IMAGE_PATH,
+    flash_prompt_for,
+    generate,
+    image_prompt_for,
+    load_state,
+    save_state,
+)
+from paths import slugify
+
+VIDEO_PATH = "output_video.mp4"
+
+
+def load_manifest(path):
+    """Read a JSONL or CSV manifest into a list of job dicts."""
+    if path.lower().endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = [dict(row) for row in csv.DictReader(f)]
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+
+    jobs, seen = [], set()
+    for row in rows:
+        topic = (row.get("topic") or "").strip()
+        if not topic:
+            raise ValueError(f"Manifest row without a topic: {row}")
+        job_id = slugify(row.get("id") or topic)
+        if job_id in seen:
+            raise ValueError(f"Duplicate job id in manifest: {job_id}")
+        seen.add(job_id)
+        jobs.append({
+            "id": job_id,
+            "topic": topic,
+            "prompt": row.get("prompt") or flash_prompt_for(topic),
+            "image_prompt": row.get("image_prompt") or image_prompt_for(topic),
+        })
+    return jobs
+
+
+def assemble(out_dir, profile="final"):
+    """Assemble a job's video unless it is already done."""
+    state = load_state(out_dir)
+    video_path = os.path.join(out_dir, VIDEO_PATH)
+    if "assemble" in state.get("stages", {}) and os.path.exists(video_path):
+        return video_path
+    assemble_video(
+        os.path.join(out_dir, IMAGE_PATH), os.path.join(out_dir, AUDIO_PATH), video_path, profile
+    )
+    state.setdefault("stages", {})["assemble"] = {"path": VIDEO_PATH}
+    save_state(out_dir, state)
+    return video_path
+
+
+def run_planned_job(job, out_dir, profile, segments, seconds):
+    # Imported here so the single-segment path doesn't load the planner
+    import planner
+
+    if not profile:
+        # Media only, like the single-slide path: images and narration, no render
+        plan = planner.load_or_plan(job["topic"], out_dir, segments, seconds)
+        planner.segment_images(plan["segments"], os.path.join(out_dir, "images"))
+        planner.narrate_segments(plan["segments"], os.path.join(out_dir, "audio"))
+        return out_dir
+    planner.plan_video(job["topic"], out_dir, os.path.join(out_dir, VIDEO_PATH), profile, segments, seconds)
+    return out_dir
+
+
+def run_job(job, out_root, profile, segments=0, seconds=150):
+    out_dir = os.path.join(out_root, job["id"])
+    if segments:
+        return run_planned_job(job, out_dir, profile, segments, seconds)
+    state = generate(prompt=job["prompt"], image_prompt=job["image_prompt"], out_dir=out_dir)
+    if "image" not in state["stages"]:
+        raise RuntimeError("no image could be generated")
+    if profile:
+        assemble(out_dir, profile)
+    return out_dir
+
+
+def run_batch(jobs, out_root, workers=4, profile="final", segments=0, seconds=150):
+    """Fan ``jobs`` out over a bounded worker pool; returns (done, failed, seconds).
+
+    ``profile`` picks the encoding profile; ``None`` skips video assembly.
+    ``segments`` > 0 plans each job as a multi-segment video (``planner.py``).
+    """
+    start = time.monotonic()
+    done, failed = [], []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_job, job, out_root, profile, segments, seconds): job for job in jobs}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                future.result()
+                done.append(job["id"])
+                print(f"✅ [{len(done) + len(failed)}/{len(jobs)}] {job['id']}")
+            except Exception as e:
+                failed.append(job["id"])
+                print(f"❌ [{len(done) + len(failed)}/{len(jobs)}] {job['id']}: {e}")
+    return done, failed, time.monotonic() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate explainer videos from a topic manifest.")
+    parser.add_argument("manifest", help="JSONL or CSV file with one topic per row")
+    parser.add_argument("--out-root", default="batch_output", help="Folder that receives one sub-folder per job")
+    parser.add_argument("--workers", type=int, default=4, help="Jobs processed concurrently")
+    parser.add_argument("--gemini-rpm", type=int, default=10, help="Max Gemini requests per minute (0 = unlimited)")
+    parser.add_argument("--hf-rpm", type=int, default=30, help="Max requests per minute per HF provider (0 = unlimited)")
+    parser.add_argument("--no-video", action="store_true", help="Only generate media, skip ffmpeg assembly")
+    parser.add_argument("--profile", default="final", choices=sorted(PROFILES), help="Video encoding profile")
+    parser.add_argument("--segments", type=int, default=0,
+                        help="Plan each video as this many segments in one Gemini call (0 = single slide)")
+    parser.add_argument("--seconds", type=int, default=150, help="Target length of planned videos")
+    args = parser.parse_args()
+
+    rate_limit.configure("gemini", args.gemini_rpm)
+    rate_limit.configure("fal-ai", args.hf_rpm)
+    rate_limit.configure("hf-inference", args.hf_rpm)
+
+    jobs = load_manifest(args.manifest)
+    print(f"📋 {len(jobs)} jobs, {args.workers} workers → {args.out_root}/")
+    profile = None if args.no_video else args.profile
+    done, failed, elapsed = run_batch(jobs, args.out_root, args.workers, profile, args.segments, args.seconds)
+
+    per_hour = len(done) / elapsed * 3600 if elapsed > 0 else 0.0
+    print(
+        f"\n🧾 {len(done)} done, {len(failed)} failed in {elapsed:.1f}s "
+        f"— {per_hour:.1f} videos/hour"
+    )
+    if failed:
+        print("Failed jobs (re-run the same command to resume):", ", ".join(failed))
+
+
+if __name__ == "__main__":
+    main()
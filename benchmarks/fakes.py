@@ -0,0 +1,201 @@
+"""Local stand-ins for Gemini, Hugging Face, agno agents and the YouTube API.
+
+Every fake takes a ``Profile`` describing its latency (mean +- jitter),
+failure rate and payload size, so the benchmarks exercise the real
+scheduling, caching and assembly code without network access or API spend.
+The response objects mirror only the attributes the pipeline reads.
+"""
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass
+from io import BytesIO
+from types import SimpleNamespace
+
+import requests
+from requests.adapters import BaseAdapter
+
+
+@dataclass
+class Profile:
+    latency: float = 0.2       # mean seconds per call
+    jitter: float = 0.05       # +/- uniform jitter in seconds
+    failure_rate: float = 0.0  # probability a call raises
+    size: int = 0              # payload size (bytes, characters or samples)
+
+    def wait(self, rng):
+        time.sleep(max(0.0, self.latency + rng.uniform(-self.jitter, self.jitter)))
+        if rng.random() < self.failure_rate:
+            raise RuntimeError("Injected fake provider failure")
+
+
+class _Calls:
+    """Thread-safe call counter and seeded RNG shared by a fake's methods."""
+
+    def __init__(self, seed):
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+        self.count = 0
+
+    def next_rng(self):
+        with self._lock:
+            self.count += 1
+            return random.Random(self._rng.random())
+
+
+def png_bytes(size=(512, 512), color=(80, 120, 200)):
+    from PIL import Image
+
+    buf = BytesIO()
+    Image.new("RGB", size, color).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def sentences(n_chars, seed=0):
+    rng = random.Random(seed)
+    words = ["models", "learn", "patterns", "from", "data", "and", "predict", "outcomes",
+             "neural", "networks", "adjust", "weights", "during", "training", "the", "a"]
+    out, length = [], 0
+    while length < n_chars:
+        sentence = " ".join(rng.choice(words) for _ in range(rng.randint(6, 14))).capitalize() + "."
+        out.append(sentence)
+        length += len(sentence) + 1
+    return " ".join(out)[:n_chars]
+
+
+class FakeModels:
+    def __init__(self, flash, tts, missing_image_rate=0.0, seed=0):
+        self.flash = flash
+        self.tts = tts
+        self.missing_image_rate = missing_image_rate
+        self.calls = _Calls(seed)
+        self._image = png_bytes()
+
+    def generate_content(self, model, contents, config=None):
+        rng = self.calls.next_rng()
+        usage = SimpleNamespace(prompt_token_count=len(str(contents)) // 4)
+        if "tts" in model:
+            self.tts.wait(rng)
+            # 24 kHz 16-bit mono: 48000 bytes per second of speech (~15 chars/s)
+            pcm = b"\x00\x01" * (len(str(contents)) * 24000 // 15)
+            parts = [SimpleNamespace(text=None, inline_data=None, audio=SimpleNamespace(pcm=pcm))]
+            usage.candidates_token_count = len(pcm) // 1000
+        else:
+            self.flash.wait(rng)
+            text = sentences(self.flash.size or 1500, seed=rng.random())
+            parts = [SimpleNamespace(text=text, inline_data=None)]
+            # A FLASH response sometimes comes back without an image
+            if rng.random() >= self.missing_image_rate:
+                parts.append(SimpleNamespace(text=None, inline_data=SimpleNamespace(data=self._image)))
+            usage.candidates_token_count = len(text) // 4
+        return SimpleNamespace(
+            candidates=[SimpleNamespace(content=SimpleNamespace(parts=parts))],
+            usage_metadata=usage,
+        )
+
+
+class FakeGenaiClient:
+    """Drop-in for ``genai.Client``: ``client.models.generate_content(...)``."""
+
+    def __init__(self, flash=None, tts=None, missing_image_rate=0.0, seed=0):
+        self.models = FakeModels(
+            flash or Profile(0.8, 0.2), tts or Profile(0.5, 0.1), missing_image_rate, seed
+        )
+
+
+class FakeInferenceClient:
+    """Drop-in for ``huggingface_hub.InferenceClient.text_to_image``."""
+
+    def __init__(self, profiles=None, seed=1):
+        # Per-provider behaviour, e.g. {"fal-ai": Profile(...), "hf-inference": Profile(...)}
+        self.profiles = profiles or {}
+        self.calls = _Calls(seed)
+
+    def text_to_image(self, prompt, model=None, provider="fal-ai"):
+        from PIL import Image
+
+        profile = self.profiles.get(provider, Profile(1.5, 0.5))
+        profile.wait(self.calls.next_rng())
+        return Image.new("RGB", (512, 512), (200, 120, 80))
+
+
+class FakeAgent:
+    """Drop-in for an agno ``Agent``: ``run(prompt)`` and ``run(prompt, stream=True)``."""
+
+    def __init__(self, profile=None, seed=2, chunk_chars=40):
+        self.profile = profile or Profile(1.0, 0.3, size=3000)
+        self.calls = _Calls(seed)
+        self.chunk_chars = chunk_chars
+
+    def _content(self, prompt, rng):
+        self.profile.wait(rng)
+        return sentences(self.profile.size or 2000, seed=rng.random())
+
+    def run(self, prompt, stream=False):
+        rng = self.calls.next_rng()
+        metrics = {"input_tokens": [len(prompt) // 4]}
+        if not stream:
+            content = self._content(prompt, rng)
+            metrics["output_tokens"] = [len(content) // 4]
+            return SimpleNamespace(content=content, metrics=metrics)
+        return self._stream(prompt, rng)
+
+    def _stream(self, prompt, rng):
+        # First token after the configured latency, then a steady trickle
+        content = self._content(prompt, rng)
+        for i in range(0, len(content), self.chunk_chars):
+            time.sleep(0.002)
+            yield SimpleNamespace(content=content[i:i + self.chunk_chars])
+
+
+class FakeTranscriptFetcher:
+    """Drop-in for ``captions.fetch_caption_transcript``.
+
+    ``available_rate`` is the share of videos whose caption track can be
+    fetched; the rest return None and go through the transcription agent.
+    """
+
+    def __init__(self, profile=None, available_rate=1.0, seed=4):
+        self.profile = profile or Profile(0.3, 0.1, size=20000)
+        self.available_rate = available_rate
+        self.calls = _Calls(seed)
+
+    def __call__(self, video_id, language):
+        rng = self.calls.next_rng()
+        self.profile.wait(rng)
+        if random.Random(video_id).random() >= self.available_rate:
+            return None
+        return sentences(self.profile.size or 20000, seed=video_id)
+
+
+class FakeCaptionsAdapter(BaseAdapter):
+    """requests adapter answering the YouTube Data API captions endpoint locally.
+
+    Mount it on a session for ``https://www.googleapis.com``.
+    """
+
+    def __init__(self, profile=None, languages=("en",), seed=3):
+        super().__init__()
+        self.profile = profile or Profile(0.15, 0.05)
+        self.languages = list(languages)
+        self.calls = _Calls(seed)
+
+    def send(self, request, **kwargs):
+        response = requests.Response()
+        response.request = request
+        response.url = request.url
+        try:
+            self.profile.wait(self.calls.next_rng())
+        except RuntimeError:
+            response.status_code = 503
+            response._content = b'{"error": "fake outage"}'
+            return response
+        response.status_code = 200
+        items = [{"snippet": {"language": lang}} for lang in self.languages]
+        response._content = json.dumps({"items": items}).encode()
+        response.headers["Content-Type"] = "application/json"
+        return response
+
+    def close(self):
+        pass
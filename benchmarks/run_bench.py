@@ -0,0 +1,372 @@
+"""Offline end-to-end benchmarks for the video pipeline and the blog server.
+
+Gemini, Hugging Face, the agno agents and the YouTube captions API are
+replaced by the fakes in ``benchmarks/fakes.py``; everything else (stage
+scheduling, caches, chunked TTS, ffmpeg assembly, the Flask routes) is the
+real code. Each scenario runs cold (empty caches) and warm (same inputs
+again) and reports p50/p95 latency, throughput and peak RSS.
+
+Usage:
+    python benchmarks/run_bench.py all --iterations 8 --concurrency 4
+    python benchmarks/run_bench.py media --latency-scale 0.5 --failure-rate 0.1
+    python benchmarks/run_bench.py blog --json results.json
+    python benchmarks/run_bench.py startup --iterations 5 --importtime
+
+Scenarios: media, assemble (needs ffmpeg on PATH), blog, blog_stream,
+startup (import cost of generate_media.py and server.py in fresh interpreters).
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BLOG_DIR = os.path.join(ROOT, "youtube video url to blog generator")
+sys.path[:0] = [ROOT, BLOG_DIR, os.path.dirname(os.path.abspath(__file__))]
+
+from fakes import (  # noqa: E402
+    FakeAgent,
+    FakeCaptionsAdapter,
+    FakeGenaiClient,
+    FakeInferenceClient,
+    FakeTranscriptFetcher,
+    Profile,
+)
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = (len(ordered) - 1) * q
+    low, high = int(index), min(int(index) + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (index - low)
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_timed(name, fn, inputs, concurrency):
+    """Call ``fn`` on every input with ``concurrency`` threads; returns a result row."""
+    latencies, errors = [], 0
+
+    def timed(item):
+        start = time.perf_counter()
+        fn(item)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(timed, item) for item in inputs]
+        for future in futures:
+            try:
+                latencies.append(future.result())
+            except Exception as e:
+                errors += 1
+                print(f"  ! {name}: {e}")
+    wall = time.perf_counter() - start
+    return {
+        "scenario": name,
+        "runs": len(latencies),
+        "errors": errors,
+        "p50_s": round(percentile(latencies, 0.50), 3),
+        "p95_s": round(percentile(latencies, 0.95), 3),
+        "throughput_per_min": round(len(latencies) / wall * 60, 2) if wall else 0.0,
+        "wall_s": round(wall, 2),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def scaled(profile, args):
+    return Profile(
+        latency=profile.latency * args.latency_scale,
+        jitter=profile.jitter * args.latency_scale,
+        failure_rate=args.failure_rate if profile.failure_rate is None else profile.failure_rate,
+        size=profile.size,
+    )
+
+
+def bench_media(args, tmp):
+    os.environ.setdefault("GEMINI_API_KEY", "fake-key")
+    import generate_media
+    import providers
+    from image_router import ProviderRouter
+    from media_cache import MediaCache
+
+    providers.override("gemini", FakeGenaiClient(
+        flash=scaled(Profile(2.0, 0.5, None, size=args.text_chars), args),
+        tts=scaled(Profile(1.5, 0.4, None), args),
+        missing_image_rate=args.missing_image_rate,
+    ))
+    providers.override("hf", FakeInferenceClient({
+        "fal-ai": scaled(Profile(4.0, 1.0, None), args),
+        "hf-inference": scaled(Profile(2.5, 0.8, None), args),
+    }))
+    generate_media.cache = MediaCache(os.path.join(tmp, "media_cache"))
+    generate_media.router = ProviderRouter(os.path.join(tmp, "provider_stats.json"))
+
+    def job(tag):
+        def run(i):
+            generate_media.generate(
+                prompt=f"Explain benchmark topic {i} simply and generate an illustrative image.",
+                image_prompt=f"Illustration of benchmark topic {i}",
+                out_dir=os.path.join(tmp, "media", f"{tag}-{i}"),
+            )
+        return run
+
+    items = range(args.iterations)
+    return [
+        run_timed("media/cold", job("cold"), items, args.concurrency),
+        run_timed("media/warm", job("warm"), items, args.concurrency),
+    ]
+
+
+def write_test_media(tmp, seconds):
+    from PIL import Image
+
+    image = os.path.join(tmp, "bench.png")
+    Image.new("RGB", (1024, 1024), (30, 60, 90)).save(image)
+    audio = os.path.join(tmp, "bench.wav")
+    with wave.open(audio, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(24000)
+        wf.writeframes(b"\x00\x00" * 24000 * seconds)
+    return image, audio
+
+
+def bench_assemble(args, tmp):
+    if not shutil.which("ffmpeg"):
+        print("  (skipping assemble: ffmpeg not on PATH)")
+        return []
+    import assemble_video
+
+    image, audio = write_test_media(tmp, args.audio_seconds)
+    rows = []
+    for profile in ("preview", "final"):
+        clip_cache = os.path.join(tmp, f"clips-{profile}")
+        assemble_video.CLIP_CACHE_DIR = clip_cache
+
+        def run(i, profile=profile, clip_cache=clip_cache):
+            title = assemble_video.TITLE_SLIDE
+            clips = []
+            if os.path.exists(title):
+                clips.append(assemble_video.slide_clip(
+                    title, assemble_video.TITLE_DURATION, profile,
+                    fade_out=assemble_video.FADE_DURATION, cache_dir=clip_cache,
+                ))
+            clips.append(assemble_video.slide_clip(
+                image, assemble_video.probe_duration(audio), profile, cache_dir=clip_cache
+            ))
+            assemble_video.concat_with_audio(clips, audio, os.path.join(tmp, f"out-{profile}-{i}.mp4"))
+
+        # First run renders the slide clips; the rest reuse them
+        rows.append(run_timed(f"assemble/{profile}/cold", run, [0], 1))
+        rows.append(run_timed(f"assemble/{profile}/warm", run, range(1, args.iterations), args.concurrency))
+    return rows
+
+
+def blog_app(args, tmp):
+    os.environ.setdefault("GOOGLE_GEMINI_API", "fake-key")
+    os.environ.setdefault("GOOGLE_API_KEY", "fake-key")
+    os.environ["JOBS_DB"] = os.path.join(tmp, "jobs.sqlite3")
+    os.environ["BLOG_CACHE_DB"] = os.path.join(tmp, "blog_cache.sqlite3")
+    import server
+    from http_client import get_session
+
+    app = server.create_app()
+    services = server.services
+    services.transcription_agent = FakeAgent(scaled(Profile(6.0, 1.5, None, size=args.transcript_chars), args))
+    services.summarization_agent = FakeAgent(scaled(Profile(3.0, 0.8, None, size=2500), args))
+    services.new_summarization_agent = lambda: FakeAgent(scaled(Profile(3.0, 0.8, None, size=1500), args))
+    services.structuring_agent = FakeAgent(scaled(Profile(4.0, 1.0, None, size=4000), args))
+    services.single_pass_agent = FakeAgent(scaled(Profile(4.5, 1.0, None, size=4000), args))
+    server.fetch_caption_transcript = FakeTranscriptFetcher(
+        scaled(Profile(0.5, 0.1, None, size=args.transcript_chars), args), available_rate=args.caption_rate
+    )
+    get_session().mount("https://www.googleapis.com", FakeCaptionsAdapter(scaled(Profile(0.2, 0.05, None), args)))
+    return app
+
+
+def video_url(i, tag):
+    return f"https://www.youtube.com/watch?v={tag[:1]}{i:010d}"
+
+
+# Video id prefix per blog mode, so modes never share cached stages
+BLOG_MODES = {"single": "p", "three_stage": "m", "auto": "a"}
+
+
+def bench_blog(args, tmp):
+    """Cold/warm /generate_blog runs for each --blog-modes entry (single vs three-stage)."""
+    app = blog_app(args, tmp)
+
+    def job(mode):
+        def run(i):
+            response = app.test_client().post(
+                "/generate_blog", json={"url": video_url(i, BLOG_MODES[mode]), "mode": mode}
+            )
+            if response.status_code != 200:
+                raise RuntimeError(response.get_json())
+        return run
+
+    items = range(args.iterations)
+    rows = []
+    for mode in args.blog_modes.split(","):
+        rows.append(run_timed(f"blog/{mode}/cold", job(mode), items, args.concurrency))
+        rows.append(run_timed(f"blog/{mode}/warm", job(mode), items, args.concurrency))
+    return rows
+
+
+def bench_blog_stream(args, tmp):
+    app = blog_app(args, tmp)
+    first_token = []
+
+    def run(i):
+        start = time.perf_counter()
+        seen_token = False
+        response = app.test_client().post(
+            "/generate_blog/stream", json={"url": video_url(i, "s")}, buffered=False
+        )
+        for chunk in response.response:
+            if b"event: token" in chunk and not seen_token:
+                first_token.append(time.perf_counter() - start)
+                seen_token = True
+            if b"event: error" in chunk:
+                raise RuntimeError(chunk.decode(errors="replace"))
+        response.close()
+
+    row = run_timed("blog_stream/cold", run, range(args.iterations), args.concurrency)
+    row["ttft_p50_s"] = round(percentile(first_token, 0.50), 3)
+    row["ttft_p95_s"] = round(percentile(first_token, 0.95), 3)
+    return [row]
+
+
+# Heavy SDKs that should only be imported on first use
+HEAVY_MODULES = ("google.genai", "huggingface_hub", "PIL.Image", "agno.agent")
+
+STARTUP_TARGETS = {
+    "generate_media": "import generate_media",
+    "server": "import server; server.create_app()",
+}
+
+
+def startup_command(code):
+    probe = f"import json, sys; print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    return [sys.executable, "-c", f"{code}; {probe}"]
+
+
+def bench_startup(args, tmp):
+    """Cold interpreter start + import of each entry point, in a fresh process per run."""
+    env = dict(
+        os.environ,
+        PYTHONPATH=os.pathsep.join([ROOT, BLOG_DIR]),
+        GEMINI_API_KEY="fake-key",
+        JOBS_DB=os.path.join(tmp, "jobs.sqlite3"),
+        BLOG_CACHE_DB=os.path.join(tmp, "blog_cache.sqlite3"),
+    )
+    rows = []
+    for name, code in STARTUP_TARGETS.items():
+        heavy = set()
+
+        def run(i, code=code, heavy=heavy):
+            result = subprocess.run(startup_command(code), env=env, cwd=tmp,
+                                    capture_output=True, text=True, check=True)
+            heavy.update(json.loads(result.stdout.strip().splitlines()[-1]))
+
+        row = run_timed(f"startup/{name}", run, range(args.iterations), 1)
+        row["heavy_imports"] = sorted(heavy)
+        rows.append(row)
+
+        if args.importtime:
+            result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                                    env=env, cwd=tmp, capture_output=True, text=True)
+            print_import_costs(name, result.stderr)
+    return rows
+
+
+def print_import_costs(name, importtime, top=10):
+    """Top-level imports by cumulative time from ``python -X importtime`` output."""
+    costs = []
+    for line in importtime.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, module = line.split("|")
+        if cumulative.strip().isdigit() and not module.startswith("  "):
+            costs.append((int(cumulative), module.strip()))
+    print(f"  slowest top-level imports for {name}:")
+    for cumulative, module in sorted(costs, reverse=True)[:top]:
+        print(f"    {cumulative / 1000:8.1f} ms  {module}")
+
+
+SCENARIOS = {
+    "media": bench_media,
+    "assemble": bench_assemble,
+    "blog": bench_blog,
+    "blog_stream": bench_blog_stream,
+    "startup": bench_startup,
+}
+
+
+def print_table(rows):
+    columns = ["scenario", "runs", "errors", "p50_s", "p95_s", "throughput_per_min", "wall_s", "peak_rss_mb"]
+    widths = {c: max(len(c), *(len(str(r.get(c, ""))) for r in rows)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for row in rows:
+        print("  ".join(str(row.get(c, "")).ljust(widths[c]) for c in columns))
+        if "ttft_p50_s" in row:
+            print(f"    time to first token: p50 {row['ttft_p50_s']}s, p95 {row['ttft_p95_s']}s")
+        if row.get("heavy_imports"):
+            print(f"    imported at startup: {', '.join(row['heavy_imports'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline pipeline benchmarks with fake providers.")
+    parser.add_argument("scenario", nargs="?", default="all", choices=["all", *SCENARIOS])
+    parser.add_argument("--iterations", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency-scale", type=float, default=0.25,
+                        help="Multiply every fake's latency (1.0 = realistic API latencies)")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Injected failure rate per call")
+    parser.add_argument("--missing-image-rate", type=float, default=0.5,
+                        help="Share of FLASH responses without an image (exercises HF fallbacks)")
+    parser.add_argument("--text-chars", type=int, default=2500, help="FLASH explanation length")
+    parser.add_argument("--transcript-chars", type=int, default=20000, help="Fake transcript length")
+    parser.add_argument("--blog-modes", default="single,three_stage",
+                        help="Comma-separated /generate_blog modes to compare (single, three_stage, auto)")
+    parser.add_argument("--caption-rate", type=float, default=0.5,
+                        help="Share of videos with a fetchable caption track (skips the transcription agent)")
+    parser.add_argument("--audio-seconds", type=int, default=60, help="Narration length for assembly")
+    parser.add_argument("--importtime", action="store_true",
+                        help="startup: also list the slowest imports (python -X importtime)")
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    names = list(SCENARIOS) if args.scenario == "all" else [args.scenario]
+    rows = []
+    with tempfile.TemporaryDirectory(prefix="bench-") as tmp:
+        os.environ["METRICS_LOG"] = os.path.join(tmp, "metrics.jsonl")
+        for name in names:
+            print(f"▶ {name}")
+            scenario_dir = os.path.join(tmp, name)
+            os.makedirs(scenario_dir)
+            rows.extend(SCENARIOS[name](args, scenario_dir))
+
+    print()
+    print_table(rows)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -151,95 +151,300 @@
 
 
 
+import json
 import os
-import wave
-from io import BytesIO
-from PIL import Image
+import threading
 from dotenv import load_dotenv
-from google import genai
-from google.genai import types
-from huggingface_hub import InferenceClient
 
-# Load env keys
+import providers
+import quota
+from image_router import ProviderRouter
+from image_sink import PRESIZE, TARGET_SIZE, encode_image, sniff, write_image
+from media_cache import MediaCache, cache_key
+from metrics import event, record_usage, span
+from rate_limit import throttle
+from stage_scheduler import StageGraph
+from tts_stream import split_text, synthesize_to_wav
+
+# Load env keys; the Gemini and HF clients are built on first use (providers.py)
 load_dotenv()
-gemini = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
-hf = None
-if os.getenv("HF_TOKEN"):
-    hf = InferenceClient(provider="fal-ai", api_key=os.getenv("HF_TOKEN"))
-
-def save_audio(path, pcm_bytes):
-    with wave.open(path, "wb") as wf:
-        wf.setnchannels(1)
-        wf.setsampwidth(2)
-        wf.setframerate(24000)
-        wf.writeframes(pcm_bytes)
-
-# 1️⃣ Generate explanation + image via Gemini FLASH
-text, img_saved = "", False
-resp = gemini.models.generate_content(
-    model="gemini-2.0-flash-preview-image-generation",
-    contents="Explain Artificial Intelligence simply and generate an illustrative image.",
-    config=types.GenerateContentConfig(response_modalities=["TEXT", "IMAGE"])
-)
-
-for part in resp.candidates[0].content.parts:
-    if part.text:
-        text += part.text
-    if part.inline_data and part.inline_data.data and not img_saved:
-        try:
-            img = Image.open(BytesIO(part.inline_data.data))
-            img.save("ai_explained.png")
-            print("✅ FLASH image saved.")
-            img_saved = True
-        except Exception:
-            print("⚠️ FLASH image invalid — falling back")
-
-# 2️⃣ Fallback via HF FLUX API
-if not img_saved and hf:
-    try:
-        print("🔄 Attempting Hugging Face FLUX via Inference API...")
-        image = hf.text_to_image(
-            "Friendly robot AI illustration: input → thinking → output",
-            model="black-forest-labs/FLUX.1-dev"
+
+# Shared by the FLASH, HF and TTS stages
+cache = MediaCache()
+
+FLASH_MODEL = "gemini-2.0-flash-preview-image-generation"
+FLASH_PROMPT = "Explain Artificial Intelligence simply and generate an illustrative image."
+FLUX_PROMPT = "Friendly robot AI illustration: input → thinking → output"
+TTS_MODEL = "gemini-2.5-flash-preview-tts"
+TTS_VOICE = "Kore"
+IMAGE_PATH = "ai_explained.png"
+AUDIO_PATH = "tts_audio.wav"
+STATE_FILE = "state.json"
+
+# Start the next HF provider if the current one hasn't answered by then
+# (until the router has enough history to use the provider's own p95)
+HF_HEDGE_AFTER = float(os.getenv("HF_HEDGE_AFTER", "20"))
+HF_DEADLINE = float(os.getenv("HF_DEADLINE", "120"))
+
+# Narration is synthesized in chunks of this many characters, a few at a time
+TTS_CHUNK_CHARS = int(os.getenv("TTS_CHUNK_CHARS", "800"))
+TTS_WORKERS = int(os.getenv("TTS_WORKERS", "3"))
+
+def gemini_call(model, contents, config):
+    """generate_content under the local rate limit and the shared quota (batch class)."""
+    throttle("gemini")
+    estimate = quota.estimate_tokens(contents)
+    quota.acquire(model, estimate, quota.BATCH)
+    resp = providers.get("gemini").models.generate_content(model=model, contents=contents, config=config)
+    quota.settle(model, estimate, getattr(getattr(resp, "usage_metadata", None), "total_token_count", None))
+    return resp
+
+def flash_generate(prompt, sp=None):
+    """FLASH text + image call; returns {"text": str, "image": bytes|None}."""
+    from google.genai import types
+
+    resp = gemini_call(
+        FLASH_MODEL, prompt, types.GenerateContentConfig(response_modalities=["TEXT", "IMAGE"])
+    )
+    if sp:
+        record_usage(sp, resp)
+    text, image = "", None
+    for part in resp.candidates[0].content.parts:
+        if part.text:
+            text += part.text
+        if part.inline_data and part.inline_data.data and image is None:
+            image = part.inline_data.data
+    return {"text": text, "image": image}
+
+def hf_generate(prompt, model, provider=None):
+    """HF text_to_image call; returns {"image": png bytes}."""
+    throttle(provider or "fal-ai")
+    kwargs = {"model": model}
+    if provider:
+        kwargs["provider"] = provider
+    image = providers.get("hf").text_to_image(prompt, **kwargs)
+    # The client hands back a decoded PIL image; encode it once, presized if enabled
+    return {"image": encode_image(image, TARGET_SIZE if PRESIZE else None)}
+
+def tts_generate(text, voice=TTS_VOICE, sp=None):
+    """Gemini TTS call; returns {"pcm": bytes}."""
+    from google.genai import types
+
+    tts_resp = gemini_call(
+        TTS_MODEL,
+        text,
+        types.GenerateContentConfig(
+            response_modalities=["AUDIO"],
+            speech_config=types.SpeechConfig(
+                voice_config=types.VoiceConfig(
+                    prebuilt_voice_config=types.PrebuiltVoiceConfig(voice_name=voice)
+                )
+            )
         )
-        image.save("ai_explained.png")
-        print("✅ HF FLUX image saved via Hugging Face")  # using FLUX.1-dev :contentReference[oaicite:1]{index=1}
-        img_saved = True
-    except Exception as e:
-        print("⚠️ HF fallback failed:", e)
-
-# 3️⃣ Final fallback: local default
-if not img_saved and hf:
+    )
+    if sp:
+        record_usage(sp, tts_resp)
+    return {"pcm": tts_resp.candidates[0].content.parts[0].audio.pcm}
+
+def flash_prompt_for(topic):
+    return f"Explain {topic} simply and generate an illustrative image."
+
+def image_prompt_for(topic):
+    return f"Friendly illustration of {topic}: input → thinking → output"
+
+def load_state(out_dir):
     try:
-        print("🔄 Attempting HF free FLUX.1‑schnell via Inference API...")
-        image = hf.text_to_image(
-            "Friendly robot AI illustration: input → thinking → output",
-            model="black-forest-labs/FLUX.1-schnell",
-            provider="hf-inference"
-        )
-        image.save("ai_explained.png")
-        print("✅ Free FLUX.1-schnell image saved.")
-        img_saved = True
-    except Exception as e:
-        print("⚠️ HF fallback failed:", e)
-
-
-# 4️⃣ Generate TTS audio using Gemini
-tts_resp = gemini.models.generate_content(
-    model="gemini-2.5-flash-preview-tts",
-    contents=text,
-    config=types.GenerateContentConfig(
-        response_modalities=["AUDIO"],
-        speech_config=types.SpeechConfig(
-            voice_config=types.VoiceConfig(
-                prebuilt_voice_config=types.PrebuiltVoiceConfig(voice_name="Kore")
+        with open(os.path.join(out_dir, STATE_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_state(out_dir, state):
+    # Write-then-rename so a crash never leaves a half-written state file
+    path = os.path.join(out_dir, STATE_FILE)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+# Image fallbacks in configured order: (provider, model, label)
+IMAGE_PROVIDERS = [
+    ("fal-ai", "black-forest-labs/FLUX.1-dev", "HF FLUX.1-dev"),
+    ("hf-inference", "black-forest-labs/FLUX.1-schnell", "Free FLUX.1-schnell"),
+]
+router = ProviderRouter()
+
+class NoImageProviderError(RuntimeError):
+    pass
+
+def hf_candidate(model, provider, label, prompt):
+    # Candidates only return bytes; the winner is written once by stage_image
+    def run():
+        print(f"🔄 Attempting {label} via Inference API...")
+        with span("hf_image", provider=provider, model=model, prompt_bytes=len(prompt.encode())) as sp:
+            result = hf_generate(prompt, model, provider=provider)
+            cache.put(cache_key(model, prompt, provider=provider), result)
+            sp.set(cache="miss", response_bytes=len(result["image"]))
+        return label, result["image"]
+    return run
+
+def fallback_image(image_prompt):
+    """Image from the HF fallbacks; returns (label, png bytes) or raises.
+
+    Raises ``NoImageProviderError`` on a cache miss when ``HF_TOKEN`` is unset.
+    """
+    # A cached image from any provider wins without touching the router
+    for provider, model, label in IMAGE_PROVIDERS:
+        hit = cache.get(cache_key(model, image_prompt, provider=provider))
+        if hit:
+            event("hf_image", provider=provider, model=model, cache="hit")
+            return label + " (cached)", hit["image"]
+    # A missing token is configuration, not an outage; keep it out of the router's stats
+    if providers.get("hf") is None:
+        raise NoImageProviderError("No HF_TOKEN set — no image fallback available")
+    # 2️⃣/3️⃣ FLUX.1-dev via fal-ai and free FLUX.1-schnell via hf-inference,
+    # fastest healthy provider first, hedged past its p95
+    return router.run(
+        {provider: hf_candidate(model, provider, label, image_prompt)
+         for provider, model, label in IMAGE_PROVIDERS},
+        hedge_after=HF_HEDGE_AFTER,
+        deadline=HF_DEADLINE,
+    )
+
+def flash_image(image_prompt):
+    """Image bytes from one FLASH call for ``image_prompt`` (cached), or None."""
+    def call():
+        flash = flash_generate(image_prompt, sp)
+        # Only the image is kept; an answer without one is not cached
+        return {"image": flash["image"]} if sniff(flash["image"] or b"")[0] else {}
+
+    key = cache_key(FLASH_MODEL, image_prompt, response_modalities=["TEXT", "IMAGE"], output="image")
+    with span("flash_image", model=FLASH_MODEL, prompt_bytes=len(image_prompt.encode())) as sp:
+        try:
+            fields, hit = cache.cached(key, call)
+        except Exception as e:
+            print("⚠️ FLASH image failed:", e)
+            fields, hit = {}, False
+        sp.set(cache="hit" if hit else "miss", response_bytes=len(fields.get("image") or b""))
+    return fields.get("image")
+
+def illustrate(image_prompt):
+    """Image for ``image_prompt``: FLASH first, then the HF fallbacks; returns (label, bytes)."""
+    image = flash_image(image_prompt)
+    if image:
+        return "flash", image
+    return fallback_image(image_prompt)
+
+def narrate(text, audio_path, voice=TTS_VOICE):
+    """Chunked TTS of ``text`` into ``audio_path``; returns (chunks, cached chunks)."""
+    chunks = split_text(text, TTS_CHUNK_CHARS)
+    hits = []
+
+    def synthesize(chunk):
+        # Cached per chunk, so editing one paragraph only re-synthesizes that chunk
+        with span("tts_chunk", model=TTS_MODEL, prompt_bytes=len(chunk.encode())) as sp:
+            tts, hit = cache.cached(
+                cache_key(TTS_MODEL, chunk, response_modalities=["AUDIO"], voice_name=voice),
+                lambda: tts_generate(chunk, voice, sp)
             )
-        )
+            sp.set(cache="hit" if hit else "miss", response_bytes=len(tts["pcm"]))
+        hits.append(hit)
+        return tts["pcm"]
+
+    synthesize_to_wav(chunks, audio_path, synthesize, max_workers=TTS_WORKERS)
+    return len(chunks), sum(hits)
+
+def generate(prompt=FLASH_PROMPT, image_prompt=FLUX_PROMPT, out_dir="."):
+    """Run the FLASH -> (image, TTS) pipeline into ``out_dir``.
+
+    Completed stages are recorded in ``out_dir/state.json`` so a re-run after
+    a crash resumes from the last finished stage. Returns the state dict.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    image_path = os.path.join(out_dir, IMAGE_PATH)
+    audio_path = os.path.join(out_dir, AUDIO_PATH)
+    state = load_state(out_dir)
+    if state.get("prompt") != prompt or state.get("image_prompt") != image_prompt:
+        state = {"prompt": prompt, "image_prompt": image_prompt, "stages": {}}
+    stages = state["stages"]
+    lock = threading.Lock()
+
+    def mark_done(name, value):
+        with lock:
+            stages[name] = value
+            save_state(out_dir, state)
+
+    def stage_flash():
+        """1️⃣ Generate explanation + image via Gemini FLASH."""
+        key = cache_key(FLASH_MODEL, prompt, response_modalities=["TEXT", "IMAGE"])
+        if "flash" in stages:
+            print("⏭️ FLASH already done — resuming.")
+            return cache.get(key) or {"text": stages["flash"]["text"], "image": None}
+        with span("flash", model=FLASH_MODEL, prompt_bytes=len(prompt.encode())) as sp:
+            flash, hit = cache.cached(key, lambda: flash_generate(prompt, sp))
+            sp.set(
+                cache="hit" if hit else "miss",
+                response_bytes=len(flash.get("text", "").encode()) + len(flash.get("image") or b""),
+            )
+        if hit:
+            print("♻️ FLASH response loaded from cache.")
+        mark_done("flash", {"text": flash.get("text", "")})
+        return flash
+
+    def stage_image(flash):
+        """Save the FLASH image, or race the HF FLUX fallbacks for one."""
+        if "image" in stages and os.path.exists(image_path):
+            return stages["image"]["source"]
+        with span("image") as sp:
+            source = save_image(flash)
+            sp.set(provider=source or "none")
+        return source
+
+    def save_image(flash):
+        size = TARGET_SIZE if PRESIZE else None
+        if flash.get("image"):
+            try:
+                how = write_image(flash["image"], image_path, size)
+                print(f"✅ FLASH image saved ({how}).")
+                mark_done("image", {"source": "flash"})
+                return "flash"
+            except Exception:
+                print("⚠️ FLASH image invalid — falling back")
+
+        try:
+            label, image_bytes = fallback_image(image_prompt)
+            how = write_image(image_bytes, image_path, size)
+            print(f"✅ {label} image saved ({how}).")
+            mark_done("image", {"source": label})
+            return label
+        except Exception as e:
+            print("⚠️ HF fallback failed:", e)
+            return None
+
+    def stage_tts(flash):
+        """4️⃣ Generate TTS audio using Gemini; only needs the FLASH text."""
+        if "tts" in stages and os.path.exists(audio_path):
+            return audio_path
+        with span("tts", model=TTS_MODEL) as sp:
+            chunks, cached = narrate(flash.get("text", ""), audio_path)
+            sp.set(chunks=chunks, cached_chunks=cached)
+        print(f"✅ TTS audio saved ({chunks} chunks, {cached} cached).")
+        mark_done("tts", {"path": AUDIO_PATH})
+        return audio_path
+
+    # Text -> TTS and the image fallback chain run concurrently once FLASH is back
+    (
+        StageGraph()
+        .add("flash", stage_flash)
+        .add("image", stage_image, deps=["flash"])
+        .add("tts", stage_tts, deps=["flash"])
+        .run()
     )
-)
-pcm = tts_resp.candidates[0].content.parts[0].audio.pcm
-save_audio("tts_audio.wav", pcm)
-print("✅ TTS audio saved.")
+    return state
+
+if __name__ == "__main__":
+    state = generate()
+    text = state["stages"]["flash"]["text"]
 
-# 🧾 Summary
-print(f"\n🎨 Image: ai_explained.png\n🔊 Audio: tts_audio.wav\n📝 Text preview: {text.strip()[:100]}…")
+    # 🧾 Summary
+    print(f"\n🎨 Image: {IMAGE_PATH}\n🔊 Audio: {AUDIO_PATH}\n📝 Text preview: {text.strip()[:100]}…")
@@ -0,0 +1,173 @@
+"""Adaptive routing over interchangeable image providers.
+
+Every call's outcome (success/failure, latency) is appended to a per-provider
+window that is persisted in ``PROVIDER_STATS`` (default
+``.provider_stats.json``), so what one run learns carries over to the next
+one and to other batch workers. From that history the router:
+
+- opens a provider's circuit after ``CIRCUIT_FAILURES`` consecutive failures
+  and skips it for ``CIRCUIT_COOLDOWN`` seconds; after the cooldown one trial
+  call is let through and its outcome closes or re-opens the circuit;
+- orders healthy providers by expected latency (median latency divided by
+  recent success rate), so the historically fastest one goes first;
+- hedges: the next provider starts once the leader has run past its own p95
+  latency (``hedge_after`` until enough samples exist).
+"""
+import json
+import os
+import threading
+import time
+
+from metrics import event
+from stage_scheduler import hedged
+
+PROVIDER_STATS = os.getenv("PROVIDER_STATS", ".provider_stats.json")
+STATS_WINDOW = int(os.getenv("PROVIDER_STATS_WINDOW", "50"))
+CIRCUIT_FAILURES = int(os.getenv("CIRCUIT_FAILURES", "3"))
+CIRCUIT_COOLDOWN = float(os.getenv("CIRCUIT_COOLDOWN", "300"))
+
+# Below this many successful samples the p95 is not trusted for hedging
+MIN_SAMPLES = 5
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class ProviderRouter:
+    def __init__(self, path=PROVIDER_STATS, window=STATS_WINDOW,
+                 failures=CIRCUIT_FAILURES, cooldown=CIRCUIT_COOLDOWN):
+        self.path = path
+        self.window = window
+        self.failures = failures
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+
+    # -- persistence --------------------------------------------------------
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, stats):
+        # Write-then-rename; concurrent writers may drop a sample, never corrupt the file
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(stats, f)
+        os.replace(tmp, self.path)
+
+    @staticmethod
+    def _entry(stats, name):
+        return stats.setdefault(name, {"calls": [], "failures": 0, "opened_at": None})
+
+    # -- bookkeeping --------------------------------------------------------
+
+    def record(self, name, ok, latency):
+        """Add one call outcome and update the provider's circuit."""
+        with self._lock:
+            stats = self._load()
+            entry = self._entry(stats, name)
+            entry["calls"] = (entry["calls"] + [[round(time.time(), 3), ok, round(latency, 3)]])[-self.window:]
+            if ok:
+                entry["failures"], entry["opened_at"] = 0, None
+            else:
+                entry["failures"] += 1
+                if entry["failures"] >= self.failures:
+                    if entry["opened_at"] is None:
+                        print(f"🚫 {name} circuit open for {self.cooldown:g}s after {entry['failures']} failures")
+                        event("image_router", provider=name, circuit="open")
+                    entry["opened_at"] = time.time()
+            self._save(stats)
+
+    def summary(self, name, stats=None):
+        """(success rate, p50, p95) over the provider's window; latencies of successes only."""
+        entry = self._entry(stats if stats is not None else self._load(), name)
+        calls = entry["calls"]
+        if not calls:
+            return None, None, None
+        latencies = [latency for _, ok, latency in calls if ok]
+        rate = len(latencies) / len(calls)
+        if not latencies:
+            return rate, None, None
+        return rate, _percentile(latencies, 0.50), _percentile(latencies, 0.95)
+
+    def order(self, names):
+        """Providers worth calling now, fastest expected first.
+
+        Untried providers keep their given order ahead of measured ones so they
+        get sampled. A provider whose cooldown has expired is let through for
+        one trial call; its circuit stays open for everyone else meanwhile.
+        """
+        now = time.time()
+        with self._lock:
+            stats = self._load()
+            ready, trial = [], False
+            for name in names:
+                entry = self._entry(stats, name)
+                opened = entry["opened_at"]
+                if opened is not None:
+                    if now - opened < self.cooldown:
+                        print(f"⏭️ Skipping {name} (circuit open)")
+                        continue
+                    entry["opened_at"] = now
+                    trial = True
+                ready.append(name)
+            if trial:
+                self._save(stats)
+
+        def expected_latency(name):
+            rate, p50, _ = self.summary(name, stats)
+            if rate is None:
+                return -1.0
+            if p50 is None:
+                return float("inf")
+            return p50 / max(rate, 0.05)
+
+        return sorted(ready, key=expected_latency)
+
+    def hedge_after(self, name, default):
+        entry = self._entry(self._load(), name)
+        if sum(1 for _, ok, _ in entry["calls"] if ok) < MIN_SAMPLES:
+            return default
+        return self.summary(name)[2]
+
+    # -- routing ------------------------------------------------------------
+
+    def run(self, candidates, hedge_after=20.0, deadline=120.0):
+        """Race ``candidates`` ({provider: callable}) in routed order.
+
+        Returns the first successful result. Every call that finishes is
+        recorded, including hedged losers; one that outlives ``deadline``
+        counts as a failure. Raises ``CircuitOpenError`` if every provider's
+        circuit is open.
+        """
+        names = self.order(list(candidates))
+        if not names:
+            raise CircuitOpenError(f"All providers unavailable: {', '.join(candidates)}")
+
+        def tracked(name):
+            def run():
+                start = time.monotonic()
+                try:
+                    result = candidates[name]()
+                except Exception:
+                    self.record(name, False, time.monotonic() - start)
+                    raise
+                latency = time.monotonic() - start
+                self.record(name, latency <= deadline, latency)
+                return result
+            return run
+
+        return hedged(
+            [tracked(name) for name in names],
+            hedge_after=[self.hedge_after(name, hedge_after) for name in names],
+            deadline=deadline,
+        )
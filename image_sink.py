@@ -0,0 +1,105 @@
+"""Write generated images to disk without a decode/re-encode round trip.
+
+Providers hand back already-encoded images: FLASH returns PNG (or JPEG)
+bytes inline, and the HF fallbacks are encoded to PNG once when they arrive.
+``sniff()`` reads the format and dimensions from the header, and
+``write_image()`` copies the bytes straight through when they already are
+the wanted format and size. PIL is only imported when something has to
+change: a format conversion, or pre-resizing to the video resolution
+(``IMAGE_PRESIZE=1``) so the assembler's ffmpeg can skip its scale filter.
+"""
+import os
+from io import BytesIO
+
+TARGET_SIZE = (1280, 720)
+PRESIZE = os.getenv("IMAGE_PRESIZE", "0") == "1"
+
+PNG_MAGIC = b"\x89PNG\r\n\x1a\n"
+JPEG_MAGIC = b"\xff\xd8\xff"
+
+# PNG zlib level for images we encode ourselves; ffmpeg decodes them once
+# anyway, so speed matters more than a few percent of file size
+PNG_COMPRESS_LEVEL = int(os.getenv("PNG_COMPRESS_LEVEL", "1"))
+
+
+def _jpeg_size(data):
+    i = 2
+    while i + 9 <= len(data):
+        if data[i] != 0xFF:
+            i += 1
+            continue
+        marker = data[i + 1]
+        if marker == 0xFF or marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            i += 1 if marker == 0xFF else 2
+            continue
+        # Start-of-frame markers carry the dimensions (C4/C8/CC are not SOFs)
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height = int.from_bytes(data[i + 5:i + 7], "big")
+            width = int.from_bytes(data[i + 7:i + 9], "big")
+            return width, height
+        i += 2 + int.from_bytes(data[i + 2:i + 4], "big")
+    return None
+
+
+def sniff(data):
+    """(format, (width, height)) from the image header, or (None, None)."""
+    if data[:8] == PNG_MAGIC and data[12:16] == b"IHDR":
+        width = int.from_bytes(data[16:20], "big")
+        height = int.from_bytes(data[20:24], "big")
+        if width and height:
+            return "PNG", (width, height)
+    elif data[:3] == JPEG_MAGIC:
+        size = _jpeg_size(data)
+        if size:
+            return "JPEG", size
+    elif data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "WEBP", None
+    return None, None
+
+
+def image_size(path):
+    """Dimensions of the image at ``path`` from its header, or None."""
+    with open(path, "rb") as f:
+        return sniff(f.read(1 << 16))[1]
+
+
+def encode_image(image, size=None):
+    """Encode a PIL image to PNG bytes, resizing to ``size`` first if given."""
+    if size and image.size != tuple(size):
+        image = image.resize(size)
+    buf = BytesIO()
+    image.save(buf, format="PNG", compress_level=PNG_COMPRESS_LEVEL)
+    return buf.getvalue()
+
+
+def write_image(data, path, size=None, fmt="PNG"):
+    """Save encoded image ``data`` as ``fmt`` at ``path``; returns "copied" or "converted".
+
+    Raises ``ValueError`` if ``data`` is not a recognisable image.
+    """
+    kind, dims = sniff(data)
+    if kind is None:
+        raise ValueError("Not a PNG, JPEG or WebP image")
+
+    if kind == fmt and (size is None or dims == tuple(size)):
+        result, payload = "copied", data
+    else:
+        from PIL import Image
+
+        image = Image.open(BytesIO(data))
+        if fmt == "PNG":
+            payload = encode_image(image, size)
+        else:
+            if size and image.size != tuple(size):
+                image = image.resize(size)
+            buf = BytesIO()
+            image.convert("RGB").save(buf, format=fmt)
+            payload = buf.getvalue()
+        result = "converted"
+
+    # Write-then-rename so a crash never leaves a truncated image behind
+    tmp = path + ".part"
+    with open(tmp, "wb") as f:
+        f.write(payload)
+    os.replace(tmp, path)
+    return result
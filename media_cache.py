@@ -0,0 +1,182 @@
+"""Content-addressed on-disk cache for generated media.
+
+Entries are keyed by a hash of (model id, prompt, config) so re-running the
+pipeline with unchanged inputs skips the paid API round trip. Each entry is a
+small directory holding one file per field (text, image bytes, PCM ...) plus a
+``meta.json``. Entries expire after a TTL and the cache is trimmed back under
+its byte budget by evicting the least recently used entries first.
+
+The cache keeps a running total of its size, so a write only scans the
+whole directory when that total goes over budget, on the first write, or
+every ``MEDIA_CACHE_SCAN_INTERVAL`` seconds (to pick up entries written by
+other processes and drop expired ones).
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+
+DEFAULT_CACHE_DIR = os.getenv("MEDIA_CACHE_DIR", ".media_cache")
+DEFAULT_MAX_BYTES = int(os.getenv("MEDIA_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+DEFAULT_TTL = int(os.getenv("MEDIA_CACHE_TTL", str(7 * 24 * 3600)))
+SCAN_INTERVAL = float(os.getenv("MEDIA_CACHE_SCAN_INTERVAL", "600"))
+
+# Once over budget, trim to this fraction of it so the next scan is many writes away
+EVICT_TO = 0.9
+
+META_FILE = "meta.json"
+
+
+def cache_key(model, prompt, **config):
+    """Hash a generation request into a stable cache key."""
+    payload = json.dumps(
+        {"model": model, "prompt": prompt, "config": config},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MediaCache:
+    """Size-bounded LRU cache with TTL, shared by text, image and TTS stages."""
+
+    def __init__(self, root=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, ttl=DEFAULT_TTL):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # Bytes on disk as of the last scan plus this process's writes since
+        self._size = None
+        self._scanned = 0.0
+        os.makedirs(self.root, exist_ok=True)
+
+    def _entry_dir(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def get(self, key):
+        """Return the cached fields for ``key`` or ``None`` on a miss."""
+        entry = self._entry_dir(key)
+        meta_path = os.path.join(entry, META_FILE)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if self.ttl and time.time() - meta.get("created", 0) > self.ttl:
+            self._remove(entry)
+            return None
+
+        fields = {}
+        try:
+            for name, kind in meta.get("fields", {}).items():
+                with open(os.path.join(entry, name), "rb") as f:
+                    data = f.read()
+                fields[name] = data.decode("utf-8") if kind == "str" else data
+        except OSError:
+            return None
+
+        # Touch meta so eviction sees this entry as recently used
+        try:
+            os.utime(meta_path, None)
+        except OSError:
+            pass
+        return fields
+
+    def put(self, key, fields):
+        """Store ``fields`` (name -> str/bytes) under ``key``; ``None`` values are skipped."""
+        entry = self._entry_dir(key)
+        tmp = os.path.join(self.root, f".tmp-{uuid.uuid4().hex}")
+        os.makedirs(tmp)
+        kinds = {}
+        size = 0
+        for name, value in fields.items():
+            if value is None:
+                continue
+            kinds[name] = "str" if isinstance(value, str) else "bytes"
+            data = value.encode("utf-8") if isinstance(value, str) else bytes(value)
+            with open(os.path.join(tmp, name), "wb") as f:
+                f.write(data)
+            size += len(data)
+        meta_path = os.path.join(tmp, META_FILE)
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump({"created": time.time(), "fields": kinds}, f)
+        size += os.path.getsize(meta_path)
+
+        with self._lock:
+            os.makedirs(os.path.dirname(entry), exist_ok=True)
+            replaced = self._entry_size(entry)
+            self._remove(entry)
+            try:
+                os.replace(tmp, entry)
+            except OSError:
+                # Another process won the race; its entry is just as good
+                self._remove(tmp)
+                size = 0
+            if self._size is not None:
+                self._size += size - replaced
+            if (self._size is None or self._size > self.max_bytes
+                    or time.time() - self._scanned > SCAN_INTERVAL):
+                self._evict()
+
+    def cached(self, key, producer):
+        """Return cached fields for ``key``, calling ``producer()`` and storing its result on a miss."""
+        hit = self.get(key)
+        if hit is not None:
+            return hit, True
+        fields = producer()
+        if fields:
+            self.put(key, fields)
+        return fields, False
+
+    def _remove(self, path):
+        shutil.rmtree(path, ignore_errors=True)
+
+    def _entry_size(self, entry):
+        try:
+            return sum(os.path.getsize(os.path.join(entry, name)) for name in os.listdir(entry))
+        except OSError:
+            return 0
+
+    def _entries(self):
+        for shard in os.listdir(self.root):
+            shard_dir = os.path.join(self.root, shard)
+            if shard.startswith(".") or not os.path.isdir(shard_dir):
+                continue
+            for key in os.listdir(shard_dir):
+                yield os.path.join(shard_dir, key)
+
+    def _evict(self):
+        now = time.time()
+        live = []
+        total = 0
+        for entry in self._entries():
+            try:
+                meta_path = os.path.join(entry, META_FILE)
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    created = json.load(f).get("created", 0)
+                used = os.path.getmtime(meta_path)
+                size = sum(
+                    os.path.getsize(os.path.join(entry, name)) for name in os.listdir(entry)
+                )
+            except (OSError, ValueError):
+                self._remove(entry)
+                continue
+            if self.ttl and now - created > self.ttl:
+                self._remove(entry)
+                continue
+            live.append((used, size, entry))
+            total += size
+
+        live.sort()
+        target = self.max_bytes * EVICT_TO if total > self.max_bytes else self.max_bytes
+        for _, size, entry in live:
+            if total <= target:
+                break
+            self._remove(entry)
+            total -= size
+        self._size = total
+        self._scanned = time.time()
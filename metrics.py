@@ -0,0 +1,174 @@
+"""Per-stage instrumentation shared by the video pipeline and the blog server.
+
+Wrap each stage in ``span()``::
+
+    with span("flash", model=FLASH_MODEL) as sp:
+        ...
+        sp.set(cache="hit", response_bytes=len(data))
+
+On exit the span records its duration and status and is folded into
+in-process aggregates that ``render_prometheus()`` exposes in the Prometheus
+text format. Set ``METRICS_LOG`` to a path to also append every finished span
+there as one JSON line; the file is rotated to ``<path>.1`` once it passes
+``METRICS_LOG_MAX_BYTES``.
+
+Recognised attributes: ``cache`` ("hit"/"miss"), ``provider`` (which
+fallback served the request), ``prompt_bytes``/``response_bytes`` and
+``input_tokens``/``output_tokens``. Anything else only goes to the JSON log.
+"""
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+METRICS_LOG = os.getenv("METRICS_LOG", "")
+METRICS_LOG_MAX_BYTES = int(os.getenv("METRICS_LOG_MAX_BYTES", str(50 * 1024 ** 2)))
+
+# Upper bounds (seconds) of the duration histogram buckets
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+_lock = threading.Lock()
+_durations = defaultdict(lambda: [0] * (len(BUCKETS) + 1))  # (stage, status) -> bucket counts
+_duration_sums = defaultdict(float)
+_counters = defaultdict(float)  # (metric, labels tuple) -> value
+
+# The JSON log has its own lock and handle, so a slow disk never blocks aggregation
+_log_lock = threading.Lock()
+_log_file = None
+
+
+class Span:
+    def __init__(self, stage, attrs):
+        self.stage = stage
+        self.attrs = dict(attrs)
+        self.status = "ok"
+        self.start = time.time()
+        self._t0 = time.perf_counter()
+        self.duration = None
+
+    def set(self, **attrs):
+        self.attrs.update({k: v for k, v in attrs.items() if v is not None})
+        return self
+
+    def add(self, **counts):
+        """Accumulate numeric attributes, e.g. tokens over several calls."""
+        for name, value in counts.items():
+            if value:
+                self.attrs[name] = self.attrs.get(name, 0) + value
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self._t0
+        if exc_type is not None:
+            self.status = "error"
+            self.attrs.setdefault("error", f"{exc_type.__name__}: {exc}")
+        _record(self)
+        return False
+
+
+def span(stage, **attrs):
+    return Span(stage, attrs)
+
+
+def event(stage, **attrs):
+    """Record an instantaneous span, e.g. a cache hit that skipped the work."""
+    with Span(stage, attrs) as sp:
+        return sp
+
+
+def record_usage(sp, response):
+    """Copy token usage from a google-genai response or an agno RunResponse onto ``sp``."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is not None:
+        sp.add(
+            input_tokens=getattr(usage, "prompt_token_count", None),
+            output_tokens=getattr(usage, "candidates_token_count", None),
+        )
+        return
+    run_metrics = getattr(response, "metrics", None)
+    if isinstance(run_metrics, dict):
+        for name in ("input_tokens", "output_tokens"):
+            value = run_metrics.get(name)
+            sp.add(**{name: sum(value) if isinstance(value, list) else value})
+
+
+def _record(sp):
+    labels = (sp.stage, sp.status)
+    with _lock:
+        buckets = _durations[labels]
+        for i, bound in enumerate(BUCKETS):
+            if sp.duration <= bound:
+                buckets[i] += 1
+                break
+        else:
+            buckets[-1] += 1
+        _duration_sums[labels] += sp.duration
+
+        if "cache" in sp.attrs:
+            _counters[("pipeline_cache_total", (("stage", sp.stage), ("result", sp.attrs["cache"])))] += 1
+        if "provider" in sp.attrs:
+            _counters[("pipeline_provider_total", (("stage", sp.stage), ("provider", sp.attrs["provider"]), ("status", sp.status)))] += 1
+        for attr, direction in (("prompt_bytes", "prompt"), ("response_bytes", "response")):
+            if sp.attrs.get(attr):
+                _counters[("pipeline_bytes_total", (("stage", sp.stage), ("direction", direction)))] += sp.attrs[attr]
+        for attr, kind in (("input_tokens", "input"), ("output_tokens", "output")):
+            if sp.attrs.get(attr):
+                _counters[("pipeline_tokens_total", (("stage", sp.stage), ("kind", kind)))] += sp.attrs[attr]
+
+    if METRICS_LOG:
+        _write_log(json.dumps(
+            {"ts": sp.start, "stage": sp.stage, "status": sp.status,
+             "duration_s": round(sp.duration, 4), "pid": os.getpid(), **sp.attrs},
+            default=str,
+        ))
+
+
+def _write_log(line):
+    global _log_file
+    with _log_lock:
+        try:
+            if _log_file is None:
+                _log_file = open(METRICS_LOG, "a", encoding="utf-8")
+            _log_file.write(line + "\n")
+            _log_file.flush()
+            if METRICS_LOG_MAX_BYTES and _log_file.tell() > METRICS_LOG_MAX_BYTES:
+                _log_file.close()
+                _log_file = None
+                os.replace(METRICS_LOG, METRICS_LOG + ".1")
+        except OSError:
+            _log_file = None
+
+
+def _fmt_labels(pairs):
+    return "{" + ",".join(f'{k}="{str(v)}"' for k, v in pairs) + "}"
+
+
+def render_prometheus():
+    """Current aggregates in the Prometheus text exposition format."""
+    lines = [
+        "# HELP pipeline_stage_duration_seconds Stage wall-clock duration.",
+        "# TYPE pipeline_stage_duration_seconds histogram",
+    ]
+    with _lock:
+        for (stage, status), buckets in sorted(_durations.items()):
+            base = (("stage", stage), ("status", status))
+            cumulative = 0
+            for bound, count in zip(BUCKETS, buckets):
+                cumulative += count
+                lines.append(f"pipeline_stage_duration_seconds_bucket{_fmt_labels(base + (('le', bound),))} {cumulative}")
+            cumulative += buckets[-1]
+            lines.append(f"pipeline_stage_duration_seconds_bucket{_fmt_labels(base + (('le', '+Inf'),))} {cumulative}")
+            lines.append(f"pipeline_stage_duration_seconds_sum{_fmt_labels(base)} {_duration_sums[(stage, status)]:.6f}")
+            lines.append(f"pipeline_stage_duration_seconds_count{_fmt_labels(base)} {cumulative}")
+
+        seen = set()
+        for (metric, labels), value in sorted(_counters.items()):
+            if metric not in seen:
+                lines.append(f"# TYPE {metric} counter")
+                seen.add(metric)
+            lines.append(f"{metric}{_fmt_labels(labels)} {value:g}")
+    return "\n".join(lines) + "\n"
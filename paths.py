@@ -0,0 +1,8 @@
+"""Output naming shared by the batch runner and the planner (no heavy imports)."""
+import re
+
+
+def slugify(text, default="job"):
+    """Lowercase, dash-separated name for ``text``, at most 60 characters."""
+    slug = re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")
+    return slug[:60] or default
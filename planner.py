@@ -0,0 +1,282 @@
+"""Plan a whole video in one Gemini call, then render it as a timeline.
+
+Instead of one free-form FLASH answer and a hard-coded image prompt, the
+planning call returns a JSON script (enforced with a response schema)::
+
+    {"title": "...", "segments": [
+        {"text": "narration", "image_prompt": "...", "duration": 30}, ...]}
+
+Downstream stages consume it directly: every segment's image is requested
+in one FLASH call that returns several images (HF fallbacks only fill the
+gaps), narration is synthesized per segment, and ``timeline.py`` renders and
+joins the segment clips. A saved plan is a valid timeline file, so it can be
+edited and re-rendered with ``python timeline.py plan.json``.
+
+Usage:
+    python planner.py "Artificial Intelligence" --segments 4 --seconds 150 --output ai.mp4
+    python planner.py "Black holes" --plan-only black_holes.json
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from generate_media import FLASH_MODEL, cache, fallback_image, gemini_call, narrate
+from image_sink import PRESIZE, TARGET_SIZE, write_image
+from media_cache import cache_key
+from metrics import record_usage, span
+from paths import slugify
+
+PLAN_MODEL = os.getenv("PLAN_MODEL", "gemini-2.0-flash")
+PLAN_FILE = "plan.json"
+
+# Narration pace used to turn target durations into text lengths
+WORDS_PER_SECOND = 2.5
+
+PLAN_INSTRUCTION = (
+    "Write the script for a {seconds}-second explainer video about {topic}, in {segments} "
+    "segments. For each segment give the narration text (about {words} words per 10 seconds "
+    "of its duration, plain spoken language, no stage directions), a concrete prompt for one "
+    "illustrative image in a consistent friendly illustration style, and its target duration "
+    "in seconds. The durations should add up to about {seconds} seconds."
+)
+
+BATCH_IMAGE_INSTRUCTION = (
+    "Generate {count} separate illustrations in a consistent friendly style, one image per "
+    "numbered description below, in this order. Output only the images.\n{prompts}"
+)
+
+PLAN_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "title": {"type": "STRING"},
+        "segments": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "text": {"type": "STRING"},
+                    "image_prompt": {"type": "STRING"},
+                    "duration": {"type": "NUMBER"},
+                },
+                "required": ["text", "image_prompt", "duration"],
+            },
+        },
+    },
+    "required": ["title", "segments"],
+}
+
+
+def parse_plan(raw):
+    """Validate a plan from the model (JSON text) into ``{"title", "segments"}``."""
+    try:
+        plan = json.loads(raw)
+    except ValueError:
+        # Fall back to the outermost JSON object if the model wrapped it in prose
+        match = re.search(r"\{.*\}", raw, re.S)
+        if not match:
+            raise ValueError("Planner did not return JSON")
+        plan = json.loads(match.group(0))
+    if not isinstance(plan, dict):
+        raise ValueError("Planner did not return a JSON object")
+    segments = [
+        {"text": seg["text"].strip(), "image_prompt": seg["image_prompt"].strip(),
+         "duration": float(seg.get("duration") or 0)}
+        for seg in plan.get("segments") or []
+        if isinstance(seg, dict) and seg.get("text", "").strip() and seg.get("image_prompt", "").strip()
+    ]
+    if not segments:
+        raise ValueError("Planner returned no usable segments")
+    return {"title": plan.get("title", "").strip(), "segments": segments}
+
+
+def plan_script(topic, segments=4, seconds=150):
+    """One Gemini call (cached) for the whole video's script; returns the parsed plan."""
+    from google.genai import types
+
+    prompt = PLAN_INSTRUCTION.format(
+        topic=topic, segments=segments, seconds=seconds, words=round(10 * WORDS_PER_SECOND)
+    )
+    config = types.GenerateContentConfig(response_mime_type="application/json", response_schema=PLAN_SCHEMA)
+
+    def call():
+        resp = gemini_call(PLAN_MODEL, prompt, config)
+        record_usage(sp, resp)
+        # Validate before returning: whatever comes back is cached for the TTL
+        parse_plan(resp.text or "")
+        return {"plan": resp.text}
+
+    with span("plan", model=PLAN_MODEL, prompt_bytes=len(prompt.encode())) as sp:
+        key = cache_key(PLAN_MODEL, prompt, schema=PLAN_SCHEMA)
+        result, hit = cache.cached(key, call)
+        try:
+            plan = parse_plan(result["plan"])
+        except (KeyError, ValueError):
+            # An unusable entry cached before plans were validated; ask again
+            result, hit = call(), False
+            cache.put(key, result)
+            plan = parse_plan(result["plan"])
+        sp.set(cache="hit" if hit else "miss", response_bytes=len(result["plan"].encode()),
+               segments=len(plan["segments"]))
+    print(f"🗒️ Planned {len(plan['segments'])} segments: {plan['title']}" + (" (cached)" if hit else ""))
+    return plan
+
+
+def batch_images(prompts):
+    """Ask FLASH for all ``prompts`` in one call; returns a list of bytes or None per prompt.
+
+    FLASH may return fewer images than asked for; only a response with
+    exactly one image per prompt is trusted, otherwise every slot is None.
+    """
+    from google.genai import types
+
+    numbered = "\n".join(f"{i}. {p}" for i, p in enumerate(prompts, 1))
+    prompt = BATCH_IMAGE_INSTRUCTION.format(count=len(prompts), prompts=numbered)
+
+    def call():
+        resp = gemini_call(FLASH_MODEL, prompt, types.GenerateContentConfig(response_modalities=["TEXT", "IMAGE"]))
+        record_usage(sp, resp)
+        images = [part.inline_data.data for part in resp.candidates[0].content.parts
+                  if part.inline_data and part.inline_data.data]
+        # Don't cache a short answer; the next run should ask again
+        if len(images) != len(prompts):
+            return {}
+        return {f"image_{i}": data for i, data in enumerate(images)}
+
+    with span("flash_batch_images", model=FLASH_MODEL, images=len(prompts), prompt_bytes=len(prompt.encode())) as sp:
+        try:
+            fields, hit = cache.cached(cache_key(FLASH_MODEL, prompt, response_modalities=["TEXT", "IMAGE"]), call)
+        except Exception as e:
+            print("⚠️ Batched FLASH images failed:", e)
+            fields, hit = {}, False
+        sp.set(cache="hit" if hit else "miss", returned=len(fields))
+    return [fields.get(f"image_{i}") for i in range(len(prompts))]
+
+
+def segment_images(segments, image_dir, workers=2):
+    """Image path per segment: one batched FLASH call, HF fallbacks for the gaps."""
+    os.makedirs(image_dir, exist_ok=True)
+    paths = [
+        os.path.join(image_dir, hashlib.sha256(seg["image_prompt"].encode()).hexdigest()[:32] + ".png")
+        for seg in segments
+    ]
+    missing = [i for i, path in enumerate(paths) if not os.path.exists(path)]
+    if not missing:
+        return paths
+
+    size = TARGET_SIZE if PRESIZE else None
+    batch = batch_images([segments[i]["image_prompt"] for i in missing])
+    gaps = []
+    for i, data in zip(missing, batch):
+        try:
+            if data:
+                write_image(data, paths[i], size)
+                continue
+        except ValueError:
+            print(f"⚠️ FLASH image for segment {i + 1} invalid — falling back")
+        gaps.append(i)
+    print(f"✅ {len(missing) - len(gaps)}/{len(missing)} images from one FLASH call.")
+
+    def fill(i):
+        label, data = fallback_image(segments[i]["image_prompt"])
+        write_image(data, paths[i], size)
+        print(f"✅ Segment {i + 1} image from {label}.")
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(fill, gaps))
+    return paths
+
+
+def narrate_segments(segments, audio_dir, workers=2):
+    """Narration WAV per segment, named by its text; existing files are kept."""
+    os.makedirs(audio_dir, exist_ok=True)
+    paths = [
+        os.path.join(audio_dir, hashlib.sha256(seg["text"].encode()).hexdigest()[:32] + ".wav")
+        for seg in segments
+    ]
+
+    def speak(i):
+        if os.path.exists(paths[i]):
+            return
+        # TTS chunks are cached, so rendering the plan later doesn't pay for them again
+        tmp = paths[i] + ".part.wav"
+        chunks, cached = narrate(segments[i]["text"], tmp)
+        os.replace(tmp, paths[i])
+        print(f"✅ Segment {i + 1} narration saved ({chunks} chunks, {cached} cached).")
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(speak, range(len(segments))))
+    return paths
+
+
+def load_or_plan(topic, out_dir, segments=4, seconds=150):
+    """The plan saved in ``out_dir`` for the same request, or a new one (saved as a timeline file)."""
+    path = os.path.join(out_dir, PLAN_FILE)
+    request = {"topic": topic, "segments": segments, "seconds": seconds}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+        if saved.get("request") == request:
+            return {"title": saved.get("name", ""), "segments": saved["segments"]}
+    except (OSError, ValueError, KeyError):
+        pass
+    plan = plan_script(topic, segments, seconds)
+    os.makedirs(out_dir, exist_ok=True)
+    save_plan(plan, path, request)
+    return plan
+
+
+def save_plan(plan, path, request=None):
+    # A timeline file; timeline.py ignores "name" and "request"
+    data = {"title": True, "name": plan["title"], "segments": plan["segments"]}
+    if request:
+        data["request"] = request
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def default_out_dir(topic):
+    return os.path.join(".plan", slugify(topic, default="video"))
+
+
+def plan_video(topic, out_dir, output, profile="final", segments=4, seconds=150, workers=2):
+    """Plan, illustrate, narrate and render ``topic`` into ``output``."""
+    from timeline import Segment, render_timeline
+
+    plan = load_or_plan(topic, out_dir, segments, seconds)
+    images = segment_images(plan["segments"], os.path.join(out_dir, "images"), workers)
+    timeline = [
+        Segment(text=seg["text"], image_prompt=seg["image_prompt"], image=image)
+        for seg, image in zip(plan["segments"], images)
+    ]
+    return render_timeline(timeline, output, profile, title=True, workers=workers)
+
+
+def main():
+    from assemble_video import PROFILES
+
+    parser = argparse.ArgumentParser(description="Plan a video in one call and render it.")
+    parser.add_argument("topic")
+    parser.add_argument("--segments", type=int, default=4)
+    parser.add_argument("--seconds", type=int, default=150, help="Target video length")
+    parser.add_argument("--out-dir", help="Plan and images are kept here for re-runs (default .plan/<topic>)")
+    parser.add_argument("--output", default="output_video.mp4")
+    parser.add_argument("--profile", default="final", choices=sorted(PROFILES))
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--plan-only", metavar="PLAN_JSON", help="Write the plan as a timeline file and stop")
+    args = parser.parse_args()
+
+    if args.plan_only:
+        save_plan(plan_script(args.topic, args.segments, args.seconds), args.plan_only)
+        print(f"Plan: {args.plan_only} (render with: python timeline.py {args.plan_only})")
+        return
+    plan_video(args.topic, args.out_dir or default_out_dir(args.topic), args.output, args.profile, args.segments, args.seconds, args.workers)
+    print(f"Final video: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Lazily constructed API clients shared by the pipeline modules.
+
+The SDKs behind them (google-genai, huggingface_hub) take a noticeable share
+of a short-lived batch container's run time just to import. Each client is
+registered here as a factory and built on the first ``get()``, so a run that
+never needs Hugging Face never imports it, and importing ``generate_media``
+costs almost nothing. ``override()`` swaps in a stand-in (see
+``benchmarks/fakes.py``).
+"""
+import os
+import threading
+
+_factories = {}
+_instances = {}
+_lock = threading.Lock()
+
+
+def register(name, factory):
+    """Register ``factory()`` as the builder for ``name``; it may return None."""
+    with _lock:
+        _factories[name] = factory
+        _instances.pop(name, None)
+
+
+def get(name):
+    """The client for ``name``, built on first use and then shared."""
+    with _lock:
+        if name not in _instances:
+            _instances[name] = _factories[name]()
+        return _instances[name]
+
+
+def override(name, instance):
+    """Use ``instance`` for ``name`` instead of building it."""
+    with _lock:
+        _instances[name] = instance
+
+
+def loaded(name):
+    with _lock:
+        return name in _instances
+
+
+def _gemini():
+    from google import genai
+
+    return genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+
+
+def _hf():
+    # The HF fallbacks are optional; without a token there is no client
+    token = os.getenv("HF_TOKEN")
+    if not token:
+        return None
+    from huggingface_hub import InferenceClient
+
+    return InferenceClient(provider="fal-ai", api_key=token)
+
+
+register("gemini", _gemini)
+register("hf", _hf)
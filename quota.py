@@ -0,0 +1,171 @@
+"""Gemini quota shared by every process on the machine.
+
+``generate_media.py`` (batch video jobs) and the blog server draw on the
+same API key. Each model gets two token buckets, requests/min and
+tokens/min, kept in one SQLite file (``QUOTA_DB``, by default next to this
+module so both tools find the same one); every check-and-take runs in an
+``IMMEDIATE`` transaction, so concurrent processes never over-draw.
+
+Priority classes: ``BATCH`` callers may only use a bucket down to
+``BATCH_RESERVE`` of its capacity, leaving the rest for ``INTERACTIVE``
+(blog) requests. Token counts are estimated before a call and corrected with
+the real usage afterwards via ``settle()``.
+
+Limits come from ``QUOTA_LIMITS``, a JSON object such as
+``{"gemini-2.0-flash": {"rpm": 15, "tpm": 1000000}}``, or ``configure()``.
+Models without limits are never throttled and never touch the database.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+QUOTA_DB = os.getenv("QUOTA_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".quota.sqlite3"))
+BATCH_RESERVE = float(os.getenv("QUOTA_BATCH_RESERVE", "0.25"))
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+
+# Rough average for English text with Gemini's tokenizer
+CHARS_PER_TOKEN = 4
+
+# Longest single sleep while waiting, so freed capacity is noticed promptly
+MAX_SLEEP = 2.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    model TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    level REAL NOT NULL,
+    updated REAL NOT NULL,
+    PRIMARY KEY (model, kind)
+);
+"""
+
+
+class QuotaExceeded(Exception):
+    """No capacity within the caller's wait budget; retry after ``retry_after`` seconds."""
+
+    def __init__(self, model, retry_after):
+        super().__init__(f"Quota for {model} exhausted; retry in {retry_after:.1f}s")
+        self.model = model
+        self.retry_after = retry_after
+
+
+def _load_limits():
+    try:
+        raw = json.loads(os.getenv("QUOTA_LIMITS", "{}"))
+    except ValueError:
+        raw = {}
+    return {model: {"requests": float(v.get("rpm") or 0), "tokens": float(v.get("tpm") or 0)}
+            for model, v in raw.items()}
+
+
+_limits = _load_limits()
+_lock = threading.Lock()
+_initialised = set()
+
+
+def configure(model, rpm=None, tpm=None):
+    """Set ``model``'s requests/min and tokens/min; ``None``/0 means unlimited."""
+    with _lock:
+        _limits[model] = {"requests": float(rpm or 0), "tokens": float(tpm or 0)}
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _connect(path):
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    if path not in _initialised:
+        conn.executescript(SCHEMA)
+        _initialised.add(path)
+    return conn
+
+
+def _take(model, need, priority, path, dry_run=False):
+    """Refill and, if there is room, debit the buckets; returns seconds to wait (0 = taken)."""
+    limits = _limits.get(model, {})
+    now = time.time()
+    conn = _connect(path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        levels, wait = {}, 0.0
+        for kind, amount in need.items():
+            limit = limits.get(kind)
+            if not limit:
+                continue
+            row = conn.execute(
+                "SELECT level, updated FROM buckets WHERE model = ? AND kind = ?", (model, kind)
+            ).fetchone()
+            level = limit if row is None else min(limit, row[0] + (now - row[1]) * limit / 60.0)
+            levels[kind] = level
+            floor = limit * BATCH_RESERVE if priority == BATCH else 0.0
+            # A request bigger than the whole bucket waits for a full bucket, not forever
+            amount = min(amount, limit - floor)
+            if level - amount < floor:
+                wait = max(wait, (floor + amount - level) * 60.0 / limit)
+        if not dry_run:
+            for kind, level in levels.items():
+                if not wait:
+                    level -= need[kind]
+                conn.execute(
+                    "INSERT OR REPLACE INTO buckets (model, kind, level, updated) VALUES (?, ?, ?, ?)",
+                    (model, kind, level, now),
+                )
+        conn.execute("COMMIT")
+        return wait
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+
+def limited(model):
+    return any(_limits.get(model, {}).values())
+
+
+def retry_after(model, tokens=0, priority=INTERACTIVE, path=None):
+    """Seconds until a call of ``tokens`` could be admitted, without taking anything."""
+    if not limited(model):
+        return 0.0
+    return _take(model, {"requests": 1, "tokens": tokens}, priority, path or QUOTA_DB, dry_run=True)
+
+
+def acquire(model, tokens=0, priority=BATCH, timeout=None, path=None):
+    """Block until one request of ~``tokens`` may be sent to ``model``.
+
+    Raises ``QuotaExceeded`` if that would take longer than ``timeout``
+    seconds (``None`` waits as long as needed). Returns the time waited.
+    """
+    if not limited(model):
+        return 0.0
+    path = path or QUOTA_DB
+    start = time.monotonic()
+    while True:
+        wait = _take(model, {"requests": 1, "tokens": tokens}, priority, path)
+        if not wait:
+            return time.monotonic() - start
+        waited = time.monotonic() - start
+        if timeout is not None and waited + wait > timeout:
+            raise QuotaExceeded(model, wait)
+        time.sleep(min(wait, MAX_SLEEP))
+
+
+def settle(model, estimated, actual, path=None):
+    """Correct the tokens bucket once a call's real usage is known."""
+    limit = _limits.get(model, {}).get("tokens")
+    if not limit or actual is None or actual == estimated:
+        return
+    conn = _connect(path or QUOTA_DB)
+    try:
+        # The level may go negative: later callers then wait off the overdraft
+        conn.execute(
+            "UPDATE buckets SET level = MIN(?, level - ?) WHERE model = ? AND kind = 'tokens'",
+            (limit, actual - estimated, model),
+        )
+    finally:
+        conn.close()
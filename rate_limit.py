@@ -0,0 +1,50 @@
+"""Per-provider request rate limiting shared by all pipeline threads.
+
+Each provider ("gemini", "fal-ai", "hf-inference" ...) gets a token bucket
+refilled at ``per_minute / 60`` tokens per second. ``throttle(provider)``
+blocks until a token is available; providers without a configured limit are
+never throttled.
+"""
+import threading
+import time
+
+
+class RateLimiter:
+    def __init__(self, per_minute, burst=None):
+        self.rate = per_minute / 60.0
+        self.capacity = float(burst if burst is not None else max(1, per_minute // 6))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until one request may be sent."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+_limiters = {}
+_lock = threading.Lock()
+
+
+def configure(provider, per_minute, burst=None):
+    """Limit ``provider`` to ``per_minute`` requests; ``None``/0 removes the limit."""
+    with _lock:
+        if per_minute:
+            _limiters[provider] = RateLimiter(per_minute, burst)
+        else:
+            _limiters.pop(provider, None)
+
+
+def throttle(provider):
+    limiter = _limiters.get(provider)
+    if limiter:
+        limiter.acquire()
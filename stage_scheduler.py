@@ -0,0 +1,110 @@
+"""Small dependency-graph scheduler for the media pipeline.
+
+Stages are plain callables that receive the results of the stages they
+depend on as keyword arguments. Every stage whose dependencies have finished
+is submitted to a shared thread pool, so independent chains (e.g. text -> TTS
+and the image fallbacks) overlap their network waits instead of running back
+to back.
+"""
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+class StageError(RuntimeError):
+    """Raised when a stage (or one of its dependencies) failed."""
+
+
+class StageGraph:
+    def __init__(self, max_workers=4):
+        self.max_workers = max_workers
+        self._stages = {}
+
+    def add(self, name, fn, deps=()):
+        """Register ``fn`` as stage ``name``; it is called with ``fn(**{dep: result})``."""
+        if name in self._stages:
+            raise ValueError(f"Duplicate stage: {name}")
+        for dep in deps:
+            if dep not in self._stages:
+                raise ValueError(f"Stage {name!r} depends on unknown stage {dep!r}")
+        self._stages[name] = (fn, tuple(deps))
+        return self
+
+    def run(self):
+        """Run all stages; returns ``{name: result}`` or raises ``StageError``."""
+        results, errors = {}, {}
+        pending = dict(self._stages)
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while pending or running:
+                for name, (fn, deps) in list(pending.items()):
+                    failed = [d for d in deps if d in errors]
+                    if failed:
+                        errors[name] = StageError(f"{name} skipped: {failed[0]} failed")
+                        del pending[name]
+                    elif all(d in results for d in deps):
+                        kwargs = {d: results[d] for d in deps}
+                        running[pool.submit(fn, **kwargs)] = name
+                        del pending[name]
+
+                if not running:
+                    continue
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:
+                        errors[name] = e
+
+        if errors:
+            name, error = next(iter(errors.items()))
+            raise StageError(f"Stage {name!r} failed: {error}") from error
+        return results
+
+
+def hedged(candidates, hedge_after=20.0, deadline=120.0):
+    """Return the first successful result from ``candidates`` (a list of callables).
+
+    The first candidate starts immediately; the next one is started when the
+    current leader fails or has not answered within ``hedge_after`` seconds.
+    ``hedge_after`` may also be a list with one delay per candidate (the wait
+    after starting that candidate). Raises ``TimeoutError`` once ``deadline``
+    seconds have passed, or the last error if every candidate failed.
+    """
+    if not candidates:
+        raise ValueError("No candidates to run")
+    delays = list(hedge_after) if isinstance(hedge_after, (list, tuple)) else [hedge_after] * len(candidates)
+
+    start = time.monotonic()
+    pool = ThreadPoolExecutor(max_workers=len(candidates))
+    queue = list(candidates)
+    running = set()
+    last_error = None
+    try:
+        running.add(pool.submit(queue.pop(0)))
+        next_hedge = start + delays[0]
+        while running or queue:
+            now = time.monotonic()
+            if now - start >= deadline:
+                raise TimeoutError(f"No candidate succeeded within {deadline}s")
+
+            if queue and (not running or now >= next_hedge):
+                next_hedge = now + delays[len(candidates) - len(queue)]
+                running.add(pool.submit(queue.pop(0)))
+                continue
+
+            timeout = min(deadline - (now - start), max(next_hedge - now, 0) if queue else deadline)
+            done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                running.discard(future)
+                try:
+                    return future.result()
+                except Exception as e:
+                    # A failed leader hands over to the next candidate right away
+                    last_error = e
+                    next_hedge = time.monotonic()
+        raise last_error
+    finally:
+        # Losers keep their threads until they return; don't block on them
+        pool.shutdown(wait=False, cancel_futures=True)
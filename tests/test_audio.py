@@ -0,0 +1,37 @@
+import math
+import os
+import sys
+from array import array
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audio import NORMALIZE_TARGET_DBFS, NORMALIZE_TOLERANCE_DB, levels, normalize_levels, wav_writer
+
+
+def write_tone(path, amplitude, seconds=0.5):
+    with wav_writer(path) as wf:
+        frames = int(24000 * seconds)
+        wf.writeframes(array("h", (int(amplitude * math.sin(i / 10)) for i in range(frames))).tobytes())
+    return path
+
+
+def test_editing_one_segment_keeps_other_normalized_paths(tmp_path):
+    out_dir = str(tmp_path / "normalized")
+    segments = [write_tone(str(tmp_path / f"seg{i}.wav"), amp) for i, amp in enumerate((2000, 6000, 12000))]
+    before = normalize_levels(segments, out_dir)
+
+    # Re-record segment 2 much louder; segments 1 and 3 must not change
+    write_tone(segments[1], 20000)
+    after = normalize_levels(segments, out_dir)
+
+    assert after[0] == before[0]
+    assert after[2] == before[2]
+    assert after[1] != before[1]
+
+
+def test_normalized_segments_reach_the_target(tmp_path):
+    segments = [write_tone(str(tmp_path / f"seg{i}.wav"), amp) for i, amp in enumerate((1000, 9000))]
+    for path in normalize_levels(segments, str(tmp_path / "normalized")):
+        db, peak = levels(path)
+        assert abs(db - NORMALIZE_TARGET_DBFS) <= NORMALIZE_TOLERANCE_DB + 0.1
+        assert peak <= 32767
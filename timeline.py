@@ -0,0 +1,220 @@
+"""Multi-segment timeline: several narrated slides in one video.
+
+A timeline is a JSON file::
+
+    {
+      "title": true,
+      "voice": "Kore",
+      "segments": [
+        {"text": "What is AI? ...", "image_prompt": "Robot thinking"},
+        {"text": "How models learn ...", "image": "assets/training.png"}
+      ]
+    }
+
+Every segment (text -> image + narration) is rendered to its own intermediate
+clip, cached under a key derived from the segment's image and narration
+content plus the encoding profile. The final video is a concat-demuxer stream
+copy of those clips, so editing one segment re-renders only that segment.
+
+Usage:
+    python timeline.py timeline.json --output output_video.mp4 --profile preview
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+
+import ffmpeg
+
+from assemble_video import (
+    CLIP_CACHE_DIR,
+    FADE_DURATION,
+    PROFILES,
+    TITLE_DURATION,
+    TITLE_SLIDE,
+    probe_duration,
+    scale_to_frame,
+)
+from audio import AAC_BITRATE, CHANNELS, SAMPLE_RATE, encode_aac, file_digest, normalize_levels
+from image_sink import PRESIZE, TARGET_SIZE, write_image
+from metrics import event, span
+
+WORK_DIR = os.getenv("TIMELINE_WORK_DIR", ".timeline")
+
+# All clips share one audio layout so the concat demuxer can stream-copy them
+AUDIO_RATE = SAMPLE_RATE
+AUDIO_CODEC = {"acodec": "aac", "ar": AUDIO_RATE, "ac": CHANNELS, "audio_bitrate": AAC_BITRATE}
+
+
+@dataclass
+class Segment:
+    text: str
+    image_prompt: Optional[str] = None
+    image: Optional[str] = None
+    # Planned length (planner.py); the narration decides the real one
+    duration: Optional[float] = None
+
+    def key(self, voice):
+        payload = json.dumps(
+            {"text": self.text, "image_prompt": self.image_prompt,
+             "image": file_digest(self.image) if self.image else None, "voice": voice},
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+def load_timeline(path):
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    segments = [Segment(**seg) for seg in data.get("segments", [])]
+    if not segments:
+        raise ValueError(f"Timeline {path} has no segments")
+    for seg in segments:
+        if not seg.image and not seg.image_prompt:
+            raise ValueError(f"Segment needs an 'image' or 'image_prompt': {seg.text[:40]!r}")
+    return data.get("title", True), data.get("voice"), segments
+
+
+def prepare_media(segment, voice, work_dir=WORK_DIR):
+    """Make sure the segment's image and narration exist; returns (image, audio)."""
+    # Imported here so rendering pre-made media doesn't need the API clients
+    from generate_media import TTS_VOICE, illustrate, narrate
+
+    voice = voice or TTS_VOICE
+    seg_dir = os.path.join(work_dir, segment.key(voice))
+    os.makedirs(seg_dir, exist_ok=True)
+
+    image = segment.image
+    if not image:
+        image = os.path.join(seg_dir, "image.png")
+        if not os.path.exists(image):
+            _, image_bytes = illustrate(segment.image_prompt)
+            write_image(image_bytes, image, TARGET_SIZE if PRESIZE else None)
+
+    audio = os.path.join(seg_dir, "narration.wav")
+    if not os.path.exists(audio):
+        tmp = os.path.join(seg_dir, "narration.part.wav")
+        narrate(segment.text, tmp, voice)
+        os.replace(tmp, audio)
+    return image, audio
+
+
+def _clip_path(parts, profile, cache_dir):
+    key = hashlib.sha256(
+        "|".join([*parts, profile, str(sorted(PROFILES[profile].items()))]).encode()
+    ).hexdigest()[:32]
+    os.makedirs(cache_dir, exist_ok=True)
+    return os.path.join(cache_dir, f"seg-{key}.mp4")
+
+
+def _encode(video, audio, clip, profile, audio_codec=AUDIO_CODEC):
+    settings = PROFILES[profile]
+    tmp = clip + ".part.mp4"
+    with span("ffmpeg_segment", profile=profile, cache="miss") as sp:
+        (
+            ffmpeg.output(
+                video, audio, tmp,
+                vcodec="libx264", preset=settings["preset"], crf=settings["crf"],
+                tune=settings["tune"], r=settings["r"], pix_fmt="yuv420p",
+                shortest=None, **audio_codec,
+            )
+            .overwrite_output()
+            .run(quiet=True)
+        )
+        os.replace(tmp, clip)
+        sp.set(response_bytes=os.path.getsize(clip))
+    return clip
+
+
+def render_title(profile, title=TITLE_SLIDE, cache_dir=CLIP_CACHE_DIR):
+    """Title slide with fade-out and a silent track matching the segment clips."""
+    clip = _clip_path([file_digest(title), "title", str(TITLE_DURATION)], profile, cache_dir)
+    if os.path.exists(clip):
+        return clip
+    video = (
+        scale_to_frame(ffmpeg.input(title, loop=1, t=TITLE_DURATION, framerate=PROFILES[profile]["r"]), title)
+        .filter("fade", t="out", st=TITLE_DURATION - FADE_DURATION, d=FADE_DURATION)
+    )
+    silence = ffmpeg.input(f"anullsrc=r={AUDIO_RATE}:cl=mono", f="lavfi", t=TITLE_DURATION)
+    return _encode(video, silence, clip, profile)
+
+
+def render_segment(image, audio, profile, cache_dir=CLIP_CACHE_DIR):
+    """Render one image + narration pair into a cached clip."""
+    clip = _clip_path([file_digest(image), file_digest(audio)], profile, cache_dir)
+    if os.path.exists(clip):
+        event("ffmpeg_segment", profile=profile, cache="hit")
+        return clip
+    duration = probe_duration(audio)
+    video = scale_to_frame(ffmpeg.input(image, loop=1, t=duration, framerate=PROFILES[profile]["r"]), image)
+    # Narration is encoded to AAC once (same settings as AUDIO_CODEC) and copied
+    # into the clip, so re-rendering for another profile skips the audio encode
+    aac = encode_aac(audio, cache_dir)
+    return _encode(video, ffmpeg.input(aac), clip, profile, audio_codec={"acodec": "copy"})
+
+
+def concat_clips(clips, output):
+    """Join clips with the concat demuxer; stream copy, no re-encode."""
+    if len(clips) == 1:
+        shutil.copyfile(clips[0], output)
+        return output
+    with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as f:
+        for clip in clips:
+            f.write(f"file '{os.path.abspath(clip)}'\n")
+        list_path = f.name
+    try:
+        with span("ffmpeg_concat", clips=len(clips)) as sp:
+            subprocess.run(
+                ["ffmpeg", "-y", "-v", "error", "-f", "concat", "-safe", "0",
+                 "-i", list_path, "-c", "copy", "-movflags", "+faststart", output],
+                check=True,
+            )
+            sp.set(response_bytes=os.path.getsize(output))
+    finally:
+        os.remove(list_path)
+    return output
+
+
+def render_timeline(segments, output, profile="final", title=True, voice=None, workers=2, normalize=True):
+    """Render every segment (in parallel, cache permitting) and concat them.
+
+    With ``normalize`` each narration is first brought to ``NORMALIZE_TARGET_DBFS``
+    on its own, so editing one segment never changes another's clip.
+    """
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown profile {profile!r}; choose from {', '.join(PROFILES)}")
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        media = list(pool.map(lambda segment: prepare_media(segment, voice), segments))
+        images = [image for image, _ in media]
+        audios = [audio for _, audio in media]
+        if normalize:
+            audios = normalize_levels(audios, os.path.join(WORK_DIR, "normalized"))
+        clips = list(pool.map(lambda pair: render_segment(*pair, profile), zip(images, audios)))
+    if title and os.path.exists(TITLE_SLIDE):
+        clips.insert(0, render_title(profile))
+    return concat_clips(clips, output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render a multi-segment explainer video.")
+    parser.add_argument("timeline", help="Timeline JSON file")
+    parser.add_argument("--output", default="output_video.mp4")
+    parser.add_argument("--profile", default="final", choices=sorted(PROFILES))
+    parser.add_argument("--workers", type=int, default=2, help="Segments rendered concurrently")
+    parser.add_argument("--no-normalize", action="store_true", help="Keep each segment's narration level as is")
+    args = parser.parse_args()
+
+    title, voice, segments = load_timeline(args.timeline)
+    render_timeline(segments, args.output, args.profile, title, voice, args.workers, not args.no_normalize)
+    print(f"Final video: {args.output} ({len(segments)} segments)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Chunked, streaming TTS synthesis.
+
+Long narrations are split on paragraph/sentence boundaries, synthesized with
+bounded parallelism and appended to the WAV file strictly in order as soon as
+each next chunk is ready. Only a small window of chunks is ever held in
+memory, and the start of the narration is on disk long before the end has
+been synthesized.
+"""
+import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from audio import wav_writer
+
+DEFAULT_MAX_CHARS = 800
+
+_SENTENCE_END = re.compile(r"(?<=[.!?…])\s+")
+
+
+def split_text(text, max_chars=DEFAULT_MAX_CHARS):
+    """Split ``text`` into chunks of at most ``max_chars`` on natural boundaries.
+
+    Paragraphs are kept whole when they fit; longer ones are packed sentence by
+    sentence. A single sentence longer than ``max_chars`` is split on spaces.
+    """
+    chunks = []
+    for paragraph in re.split(r"\n\s*\n", text.strip()):
+        paragraph = " ".join(paragraph.split())
+        if not paragraph:
+            continue
+        if len(paragraph) <= max_chars:
+            chunks.append(paragraph)
+            continue
+
+        current = ""
+        for sentence in _SENTENCE_END.split(paragraph):
+            while len(sentence) > max_chars:
+                cut = sentence.rfind(" ", 0, max_chars)
+                cut = cut if cut > 0 else max_chars
+                if current:
+                    chunks.append(current)
+                    current = ""
+                chunks.append(sentence[:cut].strip())
+                sentence = sentence[cut:].strip()
+            if current and len(current) + 1 + len(sentence) > max_chars:
+                chunks.append(current)
+                current = sentence
+            else:
+                current = f"{current} {sentence}".strip()
+        if current:
+            chunks.append(current)
+    return chunks
+
+
+def synthesize_to_wav(chunks, path, synthesize, max_workers=3, on_chunk=None):
+    """Synthesize ``chunks`` in parallel and write their PCM to ``path`` in order.
+
+    ``synthesize(chunk)`` must return raw 16-bit mono PCM bytes. At most
+    ``max_workers`` chunks are in flight (and held in memory) at any time.
+    ``on_chunk(index, total)`` is called after each chunk hits the file.
+    Returns the number of PCM bytes written.
+    """
+    total = len(chunks)
+    written = 0
+    with wav_writer(path) as wf, ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending = iter(chunks)
+        window = deque()
+        for chunk in pending:
+            window.append(pool.submit(synthesize, chunk))
+            if len(window) >= max_workers:
+                break
+
+        index = 0
+        while window:
+            pcm = window.popleft().result()
+            # Refill before writing so the pool never idles on disk I/O
+            for chunk in pending:
+                window.append(pool.submit(synthesize, chunk))
+                break
+            wf.writeframes(pcm)
+            written += len(pcm)
+            index += 1
+            if on_chunk:
+                on_chunk(index, total)
+    return written
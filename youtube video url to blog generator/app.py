@@ -1,6 +1,7 @@
 import streamlit as st
 import requests
-import time
+import json
+from http_client import SERVER_ERROR_STATUSES, get_session
 from urllib.parse import urlparse
 
 # Configure the page
@@ -27,6 +28,18 @@ st.markdown("""
     </style>
     """, unsafe_allow_html=True)
 
+SERVER_URL = "http://localhost:5000"
+STREAM_READ_TIMEOUT = 300  # max silence between server events (5 minutes)
+
+STAGE_LABELS = {
+    "queued": "⏳ Waiting for a free worker...",
+    "captions": "🔎 Checking available captions...",
+    "transcription": "🎙️ Transcribing video...",
+    "summarization": "🧠 Summarizing transcript...",
+    "structuring": "✍️ Structuring blog post...",
+    "done": "✅ Blog post generated successfully!",
+}
+
 def validate_youtube_url(url):
     """Validate if the URL is a proper YouTube URL."""
     try:
@@ -35,6 +48,38 @@ def validate_youtube_url(url):
     except:
         return False
 
+class ServerBusy(RuntimeError):
+    """The server is out of quota; ``retry_after`` is its suggested wait in seconds."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def busy_message(retry_after):
+    return f"⏳ The server is busy right now. Please try again in about {max(1, round(float(retry_after)))} seconds."
+
+def stream_events(youtube_url):
+    """POST to the streaming endpoint and yield (event, data) pairs from the SSE stream."""
+    # Pooled keep-alive session; a POST retried after a 5xx is harmless here. A 429
+    # is not retried: the server sheds load on purpose, so the user is told instead
+    with get_session(("GET", "POST"), SERVER_ERROR_STATUSES).post(
+        f"{SERVER_URL}/generate_blog/stream",
+        json={"url": youtube_url, "language": "en"},
+        stream=True,
+        timeout=(10, STREAM_READ_TIMEOUT)
+    ) as response:
+        if response.status_code == 429:
+            raise ServerBusy(response.json().get("error", "Server busy"), response.headers.get("Retry-After", 0))
+        if response.status_code != 200:
+            raise RuntimeError(response.json().get("error", "Unknown error occurred"))
+        event = None
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: ") and event:
+                yield event, json.loads(line[len("data: "):])
+                event = None
+
 # Title and description
 st.title("🎥 YouTube Video to Blog Generator")
 st.markdown("""
@@ -68,31 +113,36 @@ if generate_button:
             
             # Update progress
             status_text.text("🔄 Connecting to server...")
-            progress_bar.progress(10)
+            progress_bar.progress(2)
             
-            # Send request to backend
-            response = requests.post(
-                "http://localhost:5000/generate_blog",
-                json={"url": youtube_url, "language": "en"},
-                timeout=300  # 5-minute timeout
-            )
+            outcome = {}
             
-            progress_bar.progress(30)
-            status_text.text("🎥 Processing video content...")
+            def blog_tokens():
+                """Yield blog text as the server streams it, updating progress on the way."""
+                for event, data in stream_events(youtube_url):
+                    if event == "stage":
+                        progress_bar.progress(data.get("progress", 0))
+                        status_text.text(STAGE_LABELS.get(data.get("stage"), "🎥 Processing video content..."))
+                    elif event == "token":
+                        yield data["text"]
+                    elif event == "done":
+                        outcome["result"] = data
+                    elif event == "error":
+                        outcome["error"] = data.get("error")
+                        outcome["retry_after"] = data.get("retry_after")
             
-            if response.status_code == 200:
-                data = response.json()
-                blog_content = data.get("blog_content", "")
-                used_language = data.get("used_language", "en")
+            # Render the blog incrementally as it is written
+            st.markdown("---")
+            st.subheader("📝 Generated Blog Post")
+            blog_content = st.write_stream(blog_tokens())
+            
+            if "result" in outcome:
+                blog_content = outcome["result"].get("blog_content", blog_content)
+                used_language = outcome["result"].get("used_language", "en")
                 
                 progress_bar.progress(100)
                 status_text.text("✅ Blog post generated successfully!")
                 
-                # Display the blog content
-                st.markdown("---")
-                st.subheader("📝 Generated Blog Post")
-                st.markdown(blog_content)
-                
                 # Add download button
                 st.download_button(
                     label="📥 Download Blog Post",
@@ -101,12 +151,16 @@ if generate_button:
                     mime="text/markdown"
                 )
                 
+            elif outcome.get("retry_after") is not None:
+                st.warning(busy_message(outcome["retry_after"]))
             else:
-                error_message = response.json().get("error", "Unknown error occurred")
+                error_message = outcome.get("error") or "Unknown error occurred"
                 st.error(f"❌ Error: {error_message}")
                 progress_bar.empty()
                 status_text.empty()
                 
+        except ServerBusy as e:
+            st.warning(busy_message(e.retry_after))
         except requests.exceptions.Timeout:
             st.error("⏰ Request timed out. The video might be too long or the server is busy.")
         except requests.exceptions.ConnectionError:
@@ -0,0 +1,101 @@
+"""Persistent SQLite cache for per-stage blog pipeline results.
+
+Caption language lists, transcripts, summaries and finished blogs are stored
+under keys built from the video id, language and a fingerprint of the model
+and prompt that produced them, so changing a prompt invalidates only the
+stages it affects. Entries expire after a TTL; once the cache grows past its
+byte budget the least recently used entries are evicted.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed);
+"""
+
+
+def cache_key(*parts):
+    """Join key parts; long parts (prompts) are replaced by a short hash."""
+    normalised = []
+    for part in parts:
+        part = str(part)
+        if len(part) > 64:
+            part = hashlib.sha256(part.encode("utf-8")).hexdigest()[:16]
+        normalised.append(part)
+    return ":".join(normalised)
+
+
+class ResultCache:
+    def __init__(self, path=None, ttl=None, max_bytes=None):
+        self.path = path or os.getenv("BLOG_CACHE_DB", "blog_cache.sqlite3")
+        self.ttl = ttl if ttl is not None else int(os.getenv("BLOG_CACHE_TTL", str(7 * 24 * 3600)))
+        self.max_bytes = max_bytes if max_bytes is not None else int(
+            os.getenv("BLOG_CACHE_MAX_BYTES", str(256 * 1024 ** 2))
+        )
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def ping(self):
+        with self._connect() as conn:
+            conn.execute("SELECT 1")
+
+    def get(self, key):
+        """Return the cached value for ``key`` or ``None`` on a miss/expiry."""
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute("SELECT value, created FROM cache WHERE key = ?", (key,)).fetchone()
+            if not row:
+                return None
+            value, created = row
+            if self.ttl and now - created > self.ttl:
+                conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE cache SET accessed = ? WHERE key = ?", (now, key))
+        return json.loads(value)
+
+    def set(self, key, value):
+        data = json.dumps(value)
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, data, len(data), now, now),
+            )
+            self._evict(conn, now)
+
+    def get_or_compute(self, key, compute):
+        """Return ``(value, hit)``; empty results from ``compute`` are not cached."""
+        value = self.get(key)
+        if value is not None:
+            return value, True
+        value = compute()
+        if value:
+            self.set(key, value)
+        return value, False
+
+    def _evict(self, conn, now):
+        if self.ttl:
+            conn.execute("DELETE FROM cache WHERE created < ?", (now - self.ttl,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in conn.execute("SELECT key, size FROM cache ORDER BY accessed").fetchall():
+            conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
@@ -0,0 +1,50 @@
+"""Caption fast path: fetch a video's caption track instead of transcribing it.
+
+When ``check_available_captions`` finds a caption track, the transcript is
+read straight from it with ``youtube_transcript_api`` (an optional
+dependency; agno's YouTubeTools already pulls it in) and normalized into
+plain prose. The LLM transcription agent is only needed for videos without
+captions, or when the track can't be fetched.
+"""
+import html
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# Sound cues and speaker markers that carry no content: [Music], (applause), >>
+CUE_RE = re.compile(r"\[[^\]]*\]|\([^)]*\)|>>")
+SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_transcript(lines):
+    """Join caption lines into one text: unescape, drop cues and repeated lines."""
+    out = []
+    for line in lines:
+        text = SPACE_RE.sub(" ", CUE_RE.sub(" ", html.unescape(line or ""))).strip()
+        # Auto-generated tracks often repeat the previous line while scrolling
+        if text and (not out or text != out[-1]):
+            out.append(text)
+    return " ".join(out)
+
+
+def _caption_lines(video_id, language):
+    from youtube_transcript_api import YouTubeTranscriptApi
+
+    if hasattr(YouTubeTranscriptApi, "fetch"):
+        # youtube-transcript-api >= 1.0
+        return [snippet.text for snippet in YouTubeTranscriptApi().fetch(video_id, languages=[language])]
+    return [item["text"] for item in YouTubeTranscriptApi.get_transcript(video_id, languages=[language])]
+
+
+def fetch_caption_transcript(video_id, language):
+    """Normalized caption transcript for ``language``, or None if there is none."""
+    try:
+        lines = _caption_lines(video_id, language)
+    except ImportError:
+        logger.info("youtube-transcript-api not installed; skipping caption fast path")
+        return None
+    except Exception as e:
+        logger.warning(f"Caption track for {video_id} ({language}) unavailable: {e}")
+        return None
+    return normalize_transcript(lines) or None
@@ -0,0 +1,34 @@
+"""gunicorn settings for the blog server, configurable through the environment.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Each worker process imports ``wsgi`` and builds its own agents and job pool
+via ``create_app()``; don't enable ``preload_app`` or the model clients would
+be shared across forks.
+"""
+import multiprocessing
+import os
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+# Threads let one worker keep serving /jobs polls and SSE streams while agents run
+worker_class = 'gthread'
+threads = int(os.getenv('THREADS', 8))
+# Seconds a worker may stop notifying the master before it is killed and
+# restarted. Under gthread the notifier runs separately from request threads,
+# so this is a hang detector, not a limit on how long a request may run
+timeout = int(os.getenv('WORKER_TIMEOUT', 300))
+graceful_timeout = int(os.getenv('GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('KEEPALIVE', 5))
+accesslog = '-'
+preload_app = False
+
+
+def on_starting(server):
+    """Fail jobs left over from the previous run once, before any worker starts."""
+    from jobs import JobStore
+
+    JobStore(os.getenv('JOBS_DB', 'jobs.sqlite3')).fail_interrupted()
+    # Workers inherit this and skip their own recovery, which would otherwise
+    # mark their siblings' in-flight jobs as failed
+    os.environ['JOBS_RECOVERED_BY_MASTER'] = '1'
@@ -0,0 +1,83 @@
+"""Shared, pooled HTTP session for the server and the Streamlit client.
+
+One ``requests.Session`` per process keeps connections alive across calls, so
+repeat requests skip DNS/TCP/TLS setup. The pool size is bounded, 429/5xx
+responses are retried with jittered exponential backoff (honouring
+Retry-After), and every request gets a per-host default timeout unless the
+caller passes one.
+"""
+import os
+import threading
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "10"))
+MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+BACKOFF_FACTOR = float(os.getenv("HTTP_BACKOFF_FACTOR", "0.5"))
+BACKOFF_JITTER = float(os.getenv("HTTP_BACKOFF_JITTER", "0.5"))
+SERVER_ERROR_STATUSES = (500, 502, 503, 504)
+RETRY_STATUSES = (429, *SERVER_ERROR_STATUSES)
+
+# (connect, read) timeouts in seconds
+DEFAULT_TIMEOUT = (3.05, 30)
+HOST_TIMEOUTS = {
+    "www.googleapis.com": (3.05, 10),
+    "localhost": (3.05, 300),
+    "127.0.0.1": (3.05, 300),
+}
+
+
+def _retry(methods, statuses=RETRY_STATUSES):
+    kwargs = dict(
+        total=MAX_RETRIES,
+        backoff_factor=BACKOFF_FACTOR,
+        status_forcelist=statuses,
+        allowed_methods=frozenset(methods),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    try:
+        return Retry(backoff_jitter=BACKOFF_JITTER, **kwargs)
+    except TypeError:
+        # urllib3 < 2 has no jitter support
+        return Retry(**kwargs)
+
+
+class PooledSession(requests.Session):
+    def __init__(self, retry_methods=("GET", "HEAD", "OPTIONS"), retry_statuses=RETRY_STATUSES):
+        super().__init__()
+        adapter = HTTPAdapter(
+            pool_connections=POOL_SIZE,
+            pool_maxsize=POOL_SIZE,
+            pool_block=True,
+            max_retries=_retry(retry_methods, retry_statuses),
+        )
+        self.mount("http://", adapter)
+        self.mount("https://", adapter)
+
+    def request(self, method, url, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = HOST_TIMEOUTS.get(urlparse(url).hostname, DEFAULT_TIMEOUT)
+        return super().request(method, url, **kwargs)
+
+
+_sessions = {}
+_lock = threading.Lock()
+
+
+def get_session(retry_methods=("GET", "HEAD", "OPTIONS"), retry_statuses=RETRY_STATUSES):
+    """Return the process-wide session for this retry policy.
+
+    Only idempotent methods are retried by default; pass ``("GET", "POST")``
+    for endpoints where a repeated POST is harmless. Pass
+    ``SERVER_ERROR_STATUSES`` to hand 429s back to the caller instead of
+    waiting them out.
+    """
+    key = (tuple(sorted(retry_methods)), tuple(sorted(retry_statuses)))
+    with _lock:
+        if key not in _sessions:
+            _sessions[key] = PooledSession(retry_methods, retry_statuses)
+        return _sessions[key]
@@ -0,0 +1,209 @@
+"""Background job queue for blog generation, persisted in SQLite.
+
+``POST /jobs`` hands the pipeline to a worker pool and returns immediately;
+``GET /jobs/<id>`` reads the job row, which workers update stage by stage.
+Concurrent submissions for the same video/language are coalesced onto the
+job that is already queued or running, across worker processes.
+
+Every queue stamps its jobs with an owner id and refreshes their
+``heartbeat`` every ``JOB_HEARTBEAT`` seconds. An active job whose heartbeat
+is older than ``JOB_STALE_AFTER`` belonged to a process that died (OOM,
+SIGKILL, a ``max_requests`` restart); it is marked failed so new requests
+start a fresh job instead of waiting on it.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+ACTIVE_STATES = (QUEUED, RUNNING)
+
+HEARTBEAT_INTERVAL = float(os.getenv("JOB_HEARTBEAT", "15"))
+STALE_AFTER = float(os.getenv("JOB_STALE_AFTER", "60"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    dedupe_key TEXT NOT NULL,
+    status TEXT NOT NULL,
+    stage TEXT,
+    progress INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    owner TEXT,
+    heartbeat REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_dedupe ON jobs (dedupe_key, status);
+"""
+
+# Columns added after the first release; older databases get them on open
+MIGRATIONS = (("owner", "TEXT"), ("heartbeat", "REAL"))
+
+
+class JobStore:
+    """Thin SQLite wrapper; a fresh connection per call keeps it thread-safe."""
+
+    def __init__(self, path):
+        self.path = path
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for name, kind in MIGRATIONS:
+                if name in columns:
+                    continue
+                try:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {kind}")
+                except sqlite3.OperationalError:
+                    # A sibling worker added it first
+                    pass
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def ping(self):
+        with self._connect() as conn:
+            conn.execute("SELECT 1")
+
+    def claim(self, dedupe_key, job_id, owner, stale_after=STALE_AFTER):
+        """The live job for ``dedupe_key``, or ``job_id`` newly queued for it; returns (id, created).
+
+        Lookup and insert share one ``IMMEDIATE`` transaction, so two
+        processes submitting the same video can't both create a job.
+        """
+        now = time.time()
+        conn = self._connect()
+        conn.isolation_level = None
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            self._fail_stale(conn, now - stale_after, dedupe_key)
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE dedupe_key = ? AND status IN (?, ?) "
+                "ORDER BY created DESC LIMIT 1",
+                (dedupe_key, *ACTIVE_STATES),
+            ).fetchone()
+            if row is None:
+                conn.execute(
+                    "INSERT INTO jobs (id, dedupe_key, status, stage, progress, created, updated, owner, heartbeat) "
+                    "VALUES (?, ?, ?, ?, 0, ?, ?, ?, ?)",
+                    (job_id, dedupe_key, QUEUED, QUEUED, now, now, owner, now),
+                )
+            conn.execute("COMMIT")
+            return (job_id, True) if row is None else (row["id"], False)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def beat(self, owner):
+        """Refresh the heartbeat of every active job ``owner`` holds."""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET heartbeat = ? WHERE owner = ? AND status IN (?, ?)",
+                (time.time(), owner, *ACTIVE_STATES),
+            )
+
+    def fail_stale(self, stale_after=STALE_AFTER):
+        """Mark active jobs whose owner stopped beating as failed."""
+        with self._connect() as conn:
+            self._fail_stale(conn, time.time() - stale_after)
+
+    def _fail_stale(self, conn, cutoff, dedupe_key=None):
+        # Rows from before heartbeats existed fall back to their last update
+        query = ("UPDATE jobs SET status = ?, error = ?, updated = ? "
+                 "WHERE status IN (?, ?) AND COALESCE(heartbeat, updated) < ?")
+        params = [FAILED, "Worker stopped responding", time.time(), *ACTIVE_STATES, cutoff]
+        if dedupe_key is not None:
+            query += " AND dedupe_key = ?"
+            params.append(dedupe_key)
+        conn.execute(query, params)
+
+    def update(self, job_id, **fields):
+        if "result" in fields and fields["result"] is not None:
+            fields["result"] = json.dumps(fields["result"])
+        fields["updated"] = time.time()
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if not row:
+            return None
+        job = dict(row)
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        job.pop("dedupe_key")
+        return job
+
+    def fail_interrupted(self):
+        """Jobs left active by a previous process will never finish; mark them failed."""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated = ? WHERE status IN (?, ?)",
+                (FAILED, "Interrupted by server restart", time.time(), *ACTIVE_STATES),
+            )
+
+
+class JobQueue:
+    def __init__(self, db_path=None, max_workers=None, recover=True):
+        self.store = JobStore(db_path or os.getenv("JOBS_DB", "jobs.sqlite3"))
+        if recover:
+            self.store.fail_interrupted()
+        self.pool = ThreadPoolExecutor(
+            max_workers=max_workers or int(os.getenv("JOB_WORKERS", "4")),
+            thread_name_prefix="blog-job",
+        )
+        # Unique per queue: pids are reused, and several hosts may share the database
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        threading.Thread(target=self._heartbeat, name="blog-job-heartbeat", daemon=True).start()
+
+    def submit(self, dedupe_key, fn, *args):
+        """Queue ``fn(*args, progress=...)``; returns (job_id, coalesced).
+
+        ``fn`` reports progress by calling ``progress(stage, percent)`` and
+        returns the JSON-serialisable job result.
+        """
+        job_id, created = self.store.claim(dedupe_key, uuid.uuid4().hex, self.owner)
+        if not created:
+            return job_id, True
+        self.pool.submit(self._run, job_id, fn, args)
+        return job_id, False
+
+    def get(self, job_id):
+        return self.store.get(job_id)
+
+    def _heartbeat(self):
+        while True:
+            time.sleep(HEARTBEAT_INTERVAL)
+            try:
+                self.store.beat(self.owner)
+                # Every process sweeps, so a dead sibling's jobs are failed even
+                # if nobody asks for the same video again
+                self.store.fail_stale()
+            except sqlite3.Error as e:
+                logger.warning(f"Job heartbeat failed: {e}")
+
+    def _run(self, job_id, fn, args):
+        def progress(stage, percent):
+            self.store.update(job_id, stage=stage, progress=percent)
+
+        self.store.update(job_id, status=RUNNING)
+        try:
+            result = fn(*args, progress=progress)
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}", exc_info=True)
+            self.store.update(job_id, status=FAILED, error=str(e))
+        else:
+            self.store.update(job_id, status=DONE, stage=DONE, progress=100, result=result)
@@ -1,14 +1,26 @@
-from flask import Flask, request, jsonify
+from flask import Blueprint, Flask, Response, request, jsonify, stream_with_context
 from dotenv import load_dotenv
 import os
+import sys
+import json
 import logging
-import requests
+import math
+import queue
+import threading
 from urllib.parse import urlparse, parse_qs
 import re
+from functools import cached_property, partial
 
-from agno.agent import Agent
-from agno.models.google import Gemini
-from agno.tools.youtube import YouTubeTools
+# Modules shared with the video pipeline live at the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import quota
+from metrics import record_usage, render_prometheus, span
+from blog_cache import ResultCache, cache_key
+from captions import fetch_caption_transcript
+from http_client import get_session
+from jobs import JobQueue
+from summarize import MAP_REDUCE_THRESHOLD, map_reduce_summary
 
 # Configure logging
 logging.basicConfig(
@@ -17,6 +29,46 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+GEMINI_MODEL_ID = "gemini-2.0-flash"
+
+TRANSCRIPTION_INSTRUCTION = (
+    "Extract and transcribe audio from this YouTube URL: {youtube_url} "
+    "in {language}. Ensure to capture all important details and maintain accuracy."
+)
+
+SUMMARY_INSTRUCTION = (
+    "Summarize the transcription into key points, focusing on main ideas, "
+    "important details, and supporting evidence. Maintain clarity and coherence."
+)
+
+STRUCTURING_INSTRUCTION = (
+    "Organize the summary into a well-structured blog post with:\n"
+    "1. An engaging introduction\n"
+    "2. Clear section headings\n"
+    "3. Well-organized paragraphs\n"
+    "4. A conclusion that ties everything together\n"
+    "Use markdown formatting for better readability."
+)
+
+SINGLE_PASS_INSTRUCTION = (
+    "Turn this video transcription into a well-structured blog post. Keep the main "
+    "ideas, important details and supporting evidence, and write:\n"
+    "1. An engaging introduction\n"
+    "2. Clear section headings\n"
+    "3. Well-organized paragraphs\n"
+    "4. A conclusion that ties everything together\n"
+    "Use markdown formatting for better readability."
+)
+
+# "auto" writes the blog straight from transcripts up to this many (estimated)
+# tokens and summarizes longer ones first
+SINGLE_PASS_MAX_TOKENS = int(os.getenv("SINGLE_PASS_MAX_TOKENS", "8000"))
+MODES = ("auto", "single", "three_stage")
+
+# Longest an interactive request may wait for Gemini quota (shared with the
+# video pipeline, see quota.py) before it is turned away with a 429
+QUOTA_MAX_WAIT = float(os.getenv("QUOTA_MAX_WAIT", "5"))
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -49,17 +101,26 @@ def get_video_id(youtube_url):
     return None
 
 def check_available_captions(youtube_url):
-    """Check available caption languages for the given YouTube video."""
+    """Check available caption languages for the given YouTube video (cached per video)."""
     video_id = get_video_id(youtube_url)
     if not video_id:
         return []
+    with span("captions") as sp:
+        languages, hit = services.result_cache.get_or_compute(
+            cache_key("captions", video_id), lambda: fetch_caption_languages(video_id)
+        )
+        sp.set(cache="hit" if hit else "miss")
+    return languages
+
+def fetch_caption_languages(video_id):
+    """Ask the YouTube Data API which caption languages exist for ``video_id``."""
 
     youtube_api_key = os.getenv("GOOGLE_API_KEY")
     if not youtube_api_key:
         raise ValueError("GOOGLE_API_KEY (YouTube Data API key) not set in environment variables.")
 
     url = f"https://www.googleapis.com/youtube/v3/captions?part=snippet&videoId={video_id}&key={youtube_api_key}"
-    response = requests.get(url)
+    response = get_session().get(url)
     if response.status_code != 200:
         logger.error(f"Failed to fetch captions: {response.status_code} {response.text}")
         return []
@@ -73,53 +134,210 @@ def check_available_captions(youtube_url):
             available_languages.append(lang)
     return available_languages
 
-# Initialize Gemini model with its own API key
-gemini_api_key = os.getenv("GOOGLE_GEMINI_API")
-if not gemini_api_key:
-    raise ValueError("GOOGLE_GEMINI_API (Gemini API key) is not set in environment variables.")
+class Services:
+    """Per-process clients and agents.
 
-gemini_model = Gemini(id="gemini-2.0-flash", api_key=gemini_api_key)
+    Built once per worker process by ``create_app()`` rather than at import
+    time, so a pre-forking server gives every worker its own model client,
+    agents, cache connection and job pool. agno and the Gemini model are only
+    imported and constructed when the first request needs an agent, so the
+    worker starts (and answers /healthz) without them, and a missing API key
+    fails that request instead of the import.
+    """
 
-# Initialize Flask app
-app = Flask(__name__)
+    def __init__(self, recover_jobs=True):
+        # Per-stage results keyed by video id, language and model/prompt fingerprint
+        self.result_cache = ResultCache()
 
-# Create agents with their instructions
-transcription_agent = Agent(
-    model=gemini_model,
-    tools=[YouTubeTools()],
-    instructions=["Extract and transcribe audio from the provided YouTube URL in English."]
-)
+        # Background jobs: POST /jobs returns immediately, workers run the agents
+        self.job_queue = JobQueue(recover=recover_jobs)
 
-summarization_agent = Agent(
-    model=gemini_model,
-    instructions=["Summarize the provided transcription into key points in English."]
-)
+    @cached_property
+    def gemini_model(self):
+        from agno.models.google import Gemini
 
-structuring_agent = Agent(
-    model=gemini_model,
-    instructions=["Organize the summary into a structured blog format with appropriate headings in English."]
-)
+        gemini_api_key = os.getenv("GOOGLE_GEMINI_API")
+        if not gemini_api_key:
+            raise BlogGenerationError("GOOGLE_GEMINI_API (Gemini API key) is not set in environment variables.", 503)
+        return Gemini(id=GEMINI_MODEL_ID, api_key=gemini_api_key)
 
-@app.route('/generate_blog', methods=['POST'])
-def generate_blog():
+    @cached_property
+    def transcription_agent(self):
+        from agno.agent import Agent
+        from agno.tools.youtube import YouTubeTools
+
+        return Agent(
+            model=self.gemini_model,
+            tools=[YouTubeTools()],
+            instructions=["Extract and transcribe audio from the provided YouTube URL in English."]
+        )
+
+    @cached_property
+    def summarization_agent(self):
+        return self.new_summarization_agent()
+
+    @cached_property
+    def structuring_agent(self):
+        from agno.agent import Agent
+
+        return Agent(
+            model=self.gemini_model,
+            instructions=["Organize the summary into a structured blog format with appropriate headings in English."]
+        )
+
+    @cached_property
+    def single_pass_agent(self):
+        from agno.agent import Agent
+
+        # Gets the raw transcript, so it must not be told to expect a summary
+        return Agent(
+            model=self.gemini_model,
+            instructions=["Write a structured blog post with appropriate headings in English from the provided video transcription."]
+        )
+
+    def new_summarization_agent(self):
+        from agno.agent import Agent
+
+        return Agent(
+            model=self.gemini_model,
+            instructions=["Summarize the provided transcription into key points in English."]
+        )
+
+# Set by create_app(); None until the worker has initialised
+services = None
+
+api = Blueprint("blog", __name__)
+
+class BlogGenerationError(Exception):
+    """Pipeline failure with the HTTP status the API should report."""
+
+    def __init__(self, message, status_code=500, retry_after=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+def error_response(e):
+    """JSON error for a ``BlogGenerationError``, with Retry-After when the quota is out."""
+    response = jsonify({"error": str(e)})
+    if e.retry_after:
+        response.headers["Retry-After"] = str(math.ceil(e.retry_after))
+    return response, e.status_code
+
+def admit():
+    """Shed load up front when the Gemini quota can't serve a request soon."""
+    wait = quota.retry_after(GEMINI_MODEL_ID, priority=quota.INTERACTIVE)
+    if wait > QUOTA_MAX_WAIT:
+        raise BlogGenerationError("Gemini quota exhausted, please retry later", 429, wait)
+
+def take_quota(prompt):
+    """Reserve quota for one agent call; returns the token estimate to settle later."""
+    estimate = quota.estimate_tokens(prompt)
     try:
-        data = request.get_json()
-        if not data:
-            return jsonify({"error": "No JSON data provided"}), 400
+        quota.acquire(GEMINI_MODEL_ID, estimate, quota.INTERACTIVE, timeout=QUOTA_MAX_WAIT)
+    except quota.QuotaExceeded as e:
+        raise BlogGenerationError("Gemini quota exhausted, please retry later", 429, e.retry_after) from e
+    return estimate
+
+def settle_quota(estimate, sp, response_text):
+    """Charge the call's real token usage, or an estimate when the model didn't report it."""
+    used = sp.attrs.get("input_tokens", 0) + sp.attrs.get("output_tokens", 0)
+    quota.settle(GEMINI_MODEL_ID, estimate, used or estimate + quota.estimate_tokens(response_text or ""))
+
+def parse_blog_request(data):
+    """Validate the JSON body; returns (youtube_url, language, video_id, mode)."""
+    if not data:
+        raise BlogGenerationError("No JSON data provided", 400)
 
-        youtube_url = data.get("url", "").strip()
-        language = data.get("language", "en").strip().lower()
+    youtube_url = data.get("url", "").strip()
+    language = data.get("language", "en").strip().lower()
 
-        if not youtube_url:
-            return jsonify({"error": "No URL provided"}), 400
+    if not youtube_url:
+        raise BlogGenerationError("No URL provided", 400)
+
+    if not validate_youtube_url(youtube_url):
+        raise BlogGenerationError("Invalid YouTube URL format", 400)
+
+    video_id = get_video_id(youtube_url)
+    if not video_id:
+        raise BlogGenerationError("Could not extract video ID from URL", 400)
 
-        if not validate_youtube_url(youtube_url):
-            return jsonify({"error": "Invalid YouTube URL format"}), 400
+    mode = data.get("mode", "auto").strip().lower()
+    if mode not in MODES:
+        raise BlogGenerationError(f"Invalid mode, expected one of: {', '.join(MODES)}", 400)
 
-        video_id = get_video_id(youtube_url)
-        if not video_id:
-            return jsonify({"error": "Could not extract video ID from URL"}), 400
+    return youtube_url, language, video_id, mode
 
+def run_agent(agent, prompt, stage):
+    """Run an agent inside a metrics span and return its text content."""
+    estimate = take_quota(prompt)
+    with span(f"agent_{stage}", model=GEMINI_MODEL_ID, prompt_bytes=len(prompt.encode())) as sp:
+        response = agent.run(prompt)
+        record_usage(sp, response)
+        content = getattr(response, "content", response)
+        sp.set(response_bytes=len(content.encode()) if isinstance(content, str) else None)
+    settle_quota(estimate, sp, content if isinstance(content, str) else "")
+    return content
+
+def cached_stage(stage, key, compute):
+    """Result-cache lookup for one pipeline stage, timed as a metrics span."""
+    with span(stage) as sp:
+        value, hit = services.result_cache.get_or_compute(key, compute)
+        sp.set(cache="hit" if hit else "miss")
+    return value, hit
+
+def log_stage_output(name, text, cached):
+    """Log output sizes at INFO; full bodies only at DEBUG."""
+    size = len(text) if isinstance(text, str) else 0
+    logger.info(f"{name} output: {size} chars" + (" (cached)" if cached else ""))
+    logger.debug(f"{name} output body: {text}")
+
+def summarize_transcript(transcription):
+    """Single-prompt summary, or chunked map-reduce for long transcripts."""
+    tokens = quota.estimate_tokens(transcription)
+    if tokens <= MAP_REDUCE_THRESHOLD:
+        return run_agent(services.summarization_agent, f"{SUMMARY_INSTRUCTION}\n{transcription}", "summarization")
+    logger.info(f"Transcription is ~{tokens} tokens, using map-reduce summarization")
+    # Chunks run in parallel, so each call gets its own agent
+    return map_reduce_summary(
+        transcription, lambda prompt: run_agent(services.new_summarization_agent(), prompt, "summarization_chunk")
+    )
+
+def structure_blog(text, on_token=None, instruction=STRUCTURING_INSTRUCTION, agent=None):
+    """Run ``agent`` (the structuring agent by default) on ``text``, forwarding its token stream to ``on_token``."""
+    agent = agent or services.structuring_agent
+    prompt = f"{instruction}\n{text}"
+    if not on_token:
+        return run_agent(agent, prompt, "structuring")
+    parts = []
+    estimate = take_quota(prompt)
+    with span("agent_structuring", model=GEMINI_MODEL_ID, prompt_bytes=len(prompt.encode()), stream=True) as sp:
+        for chunk in agent.run(prompt, stream=True):
+            delta = getattr(chunk, "content", chunk)
+            if isinstance(delta, str) and delta:
+                parts.append(delta)
+                on_token(delta)
+        blog = "".join(parts)
+        sp.set(response_bytes=len(blog.encode()))
+    settle_quota(estimate, sp, blog)
+    return blog
+
+def choose_mode(mode, transcription):
+    """Resolve "auto" to "single" or "three_stage" by the transcript's token estimate."""
+    if mode != "auto":
+        return mode
+    return "single" if quota.estimate_tokens(transcription) <= SINGLE_PASS_MAX_TOKENS else "three_stage"
+
+def run_blog_pipeline(youtube_url, language, video_id, progress=None, on_token=None, mode="auto"):
+    """Transcribe, summarize and structure a video into a blog post.
+
+    ``progress(stage, percent)`` is called as each agent stage starts.
+    ``on_token(text)`` receives the blog as it is generated (or in one piece
+    when it comes from the cache). In "single" mode a separate single-pass
+    agent writes the blog straight from the transcript, skipping the summary.
+    """
+    progress = progress or (lambda stage, percent: None)
+    try:
+        progress("captions", 5)
         available_captions = check_available_captions(youtube_url)
         logger.info(f"Available captions: {available_captions}")
 
@@ -133,64 +351,206 @@ def generate_blog():
             logger.warning("No captions found, defaulting to English")
 
         # Build instructions with more context
-        transcription_instruction = (
-            f"Extract and transcribe audio from this YouTube URL: {youtube_url} "
-            f"in {language}. Ensure to capture all important details and maintain accuracy."
-        )
-        
-        summary_instruction = (
-            "Summarize the transcription into key points, focusing on main ideas, "
-            "important details, and supporting evidence. Maintain clarity and coherence."
-        )
-        
-        structuring_instruction = (
-            "Organize the summary into a well-structured blog post with:\n"
-            "1. An engaging introduction\n"
-            "2. Clear section headings\n"
-            "3. Well-organized paragraphs\n"
-            "4. A conclusion that ties everything together\n"
-            "Use markdown formatting for better readability."
+        transcription_instruction = TRANSCRIPTION_INSTRUCTION.format(
+            youtube_url=youtube_url, language=language
         )
 
-        # Run agents sequentially with progress logging
-        logger.info("Starting transcription...")
-        transcription = transcription_agent.run(transcription_instruction)
-        transcription = getattr(transcription, "content", transcription)
-        logger.info(f"Transcription output: {transcription}")
+        progress("transcription", 10)
+        transcription, hit, transcript_source = None, False, "agent"
+
+        # Fast path: read the caption track itself instead of asking the agent
+        if available_captions:
+            logger.info(f"Fetching {language} caption track...")
+            caption_key = cache_key("transcript", video_id, language, "captions")
+            transcription, hit = cached_stage(
+                "caption_transcript", caption_key, lambda: fetch_caption_transcript(video_id, language)
+            )
+            if transcription:
+                transcript_key, transcript_source = caption_key, "captions"
+
+        if not transcription:
+            logger.info("Starting transcription...")
+            transcript_key = cache_key("transcript", video_id, language, GEMINI_MODEL_ID, TRANSCRIPTION_INSTRUCTION)
+            transcription, hit = cached_stage(
+                "transcription", transcript_key,
+                lambda: run_agent(services.transcription_agent, transcription_instruction, "transcription")
+            )
+        log_stage_output(f"Transcription ({transcript_source})", transcription, hit)
         if not transcription:
-            return jsonify({"error": "Transcription failed or returned empty result"}), 500
+            raise BlogGenerationError("Transcription failed or returned empty result")
 
-        logger.info("Starting summarization...")
-        summary = summarization_agent.run(f"{summary_instruction}\n{transcription}")
-        summary = getattr(summary, "content", summary)
-        logger.info(f"Summary output: {summary}")
-        if not summary:
-            return jsonify({"error": "Summarization failed or returned empty result"}), 500
+        mode = choose_mode(mode, transcription)
+        logger.info(f"Using {mode} mode")
+
+        # Each stage's key chains the prompts of every stage that fed it,
+        # so editing one prompt invalidates only that stage and later ones
+        if mode == "single":
+            blog_key = cache_key("blog", transcript_key, SINGLE_PASS_INSTRUCTION)
+            compute_blog = lambda: structure_blog(
+                transcription, on_token, SINGLE_PASS_INSTRUCTION, services.single_pass_agent
+            )
+        else:
+            summary_key = cache_key("summary", transcript_key, SUMMARY_INSTRUCTION)
+            blog_key = cache_key("blog", summary_key, STRUCTURING_INSTRUCTION)
+
+            # Run agents sequentially with progress logging
+            logger.info("Starting summarization...")
+            progress("summarization", 50)
+            summary, hit = cached_stage("summarization", summary_key, lambda: summarize_transcript(transcription))
+            log_stage_output("Summary", summary, hit)
+            if not summary:
+                raise BlogGenerationError("Summarization failed or returned empty result")
+            compute_blog = lambda: structure_blog(summary, on_token)
 
         logger.info("Starting blog structuring...")
-        structured_blog = structuring_agent.run(f"{structuring_instruction}\n{summary}")
-        blog_content = getattr(structured_blog, "content", structured_blog)
-        logger.info(f"Structured blog output: {blog_content}")
+        progress("structuring", 75)
+        blog_content, hit = cached_stage("structuring", blog_key, compute_blog)
+        log_stage_output("Structured blog", blog_content, hit)
+        if hit and on_token:
+            on_token(blog_content)
         if not blog_content:
-            return jsonify({"error": "Blog structuring failed or returned empty result"}), 500
+            raise BlogGenerationError("Blog structuring failed or returned empty result")
 
-        return jsonify({
+        return {
             "blog_content": blog_content,
             "used_language": language,
-            "video_id": video_id
-        }), 200
+            "video_id": video_id,
+            "transcript_source": transcript_source,
+            "mode": mode
+        }
 
+    except BlogGenerationError:
+        raise
     except Exception as e:
         logger.error(f"Error during blog generation: {str(e)}", exc_info=True)
         if "PERMISSION_DENIED" in str(e):
-            return jsonify({
-                "error": "Google Gemini API access denied. Please ensure the Generative Language API is enabled and your API key is correct."
-            }), 500
+            raise BlogGenerationError(
+                "Google Gemini API access denied. Please ensure the Generative Language API is enabled and your API key is correct."
+            ) from e
+        raise
+
+@api.route('/generate_blog', methods=['POST'])
+def generate_blog():
+    try:
+        youtube_url, language, video_id, mode = parse_blog_request(request.get_json())
+        admit()
+        return jsonify(run_blog_pipeline(youtube_url, language, video_id, mode=mode)), 200
+    except BlogGenerationError as e:
+        return error_response(e)
+    except Exception as e:
         return jsonify({
             "error": "An unexpected error occurred",
             "details": str(e)
         }), 500
 
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@api.route('/generate_blog/stream', methods=['POST'])
+def generate_blog_stream():
+    """Server-sent events: ``stage`` updates, ``token`` deltas of the blog, then ``done`` or ``error``."""
+    try:
+        youtube_url, language, video_id, mode = parse_blog_request(request.get_json())
+        admit()
+    except BlogGenerationError as e:
+        return error_response(e)
+
+    events = queue.Queue()
+
+    def worker():
+        try:
+            result = run_blog_pipeline(
+                youtube_url, language, video_id,
+                progress=lambda stage, percent: events.put(sse("stage", {"stage": stage, "progress": percent})),
+                on_token=lambda text: events.put(sse("token", {"text": text})),
+                mode=mode,
+            )
+            events.put(sse("done", result))
+        except Exception as e:
+            events.put(sse("error", {"error": str(e), "retry_after": getattr(e, "retry_after", None)}))
+        finally:
+            events.put(None)
+
+    threading.Thread(target=worker, daemon=True).start()
+
+    def stream():
+        while True:
+            event = events.get()
+            if event is None:
+                break
+            yield event
+
+    return Response(
+        stream_with_context(stream()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@api.route('/jobs', methods=['POST'])
+def create_job():
+    try:
+        youtube_url, language, video_id, mode = parse_blog_request(request.get_json())
+        admit()
+    except BlogGenerationError as e:
+        return error_response(e)
+
+    # Identical concurrent requests share one job
+    job_id, coalesced = services.job_queue.submit(
+        f"{video_id}:{language}:{mode}", partial(run_blog_pipeline, mode=mode), youtube_url, language, video_id
+    )
+    logger.info(f"Job {job_id} for video {video_id} ({'coalesced' if coalesced else 'queued'})")
+    return jsonify({"job_id": job_id, "coalesced": coalesced}), 202
+
+@api.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = services.job_queue.get(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job), 200
+
+@api.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus scrape endpoint (per-process aggregates)."""
+    return Response(render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+@api.route('/healthz', methods=['GET'])
+def healthz():
+    """Liveness: the process is up and serving requests."""
+    return jsonify({"status": "ok"}), 200
+
+@api.route('/readyz', methods=['GET'])
+def readyz():
+    """Readiness: services are up, the Gemini key is set and the job and cache databases are reachable."""
+    checks = {"services": services is not None, "gemini_key": bool(os.getenv("GOOGLE_GEMINI_API"))}
+    if services is not None:
+        for name, store in (("jobs_db", services.job_queue.store), ("cache_db", services.result_cache)):
+            try:
+                store.ping()
+                checks[name] = True
+            except Exception as e:
+                logger.warning(f"Readiness check {name} failed: {e}")
+                checks[name] = False
+    ready = all(checks.values())
+    return jsonify({"ready": ready, "checks": checks}), 200 if ready else 503
+
+def create_app(recover_jobs=None):
+    """WSGI app factory (``gunicorn -c gunicorn.conf.py "server:create_app()"``).
+
+    Builds the per-process services once. ``recover_jobs`` marks jobs left
+    active by a previous run as failed; it defaults to on unless the
+    gunicorn master has already done it before forking workers.
+    """
+    global services
+    if recover_jobs is None:
+        recover_jobs = os.getenv("JOBS_RECOVERED_BY_MASTER") != "1"
+    if services is None:
+        services = Services(recover_jobs=recover_jobs)
+    app = Flask(__name__)
+    app.register_blueprint(api)
+    return app
+
 if __name__ == '__main__':
+    # Development server only; use gunicorn or waitress (see wsgi.py) in production
     port = int(os.getenv('PORT', 5000))
-    app.run(host='0.0.0.0', port=port, debug=True)
+    debug = os.getenv('FLASK_DEBUG', '0') == '1'
+    create_app().run(host='0.0.0.0', port=port, debug=debug)
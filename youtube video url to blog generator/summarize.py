@@ -0,0 +1,79 @@
+"""Map-reduce summarization for transcripts too long for a single prompt.
+
+The transcript is split into overlapping chunks on a token budget, each chunk
+is summarized in parallel (bounded concurrency), and the partial summaries
+are reduced into one summary. If the partial summaries are themselves over
+budget the reduce step recurses, so hour-long videos degrade gracefully
+instead of failing on the model's context limit.
+"""
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+# Token estimates are shared with the quota (repository root, on the server's path)
+from quota import CHARS_PER_TOKEN, estimate_tokens
+
+# Above this many (estimated) tokens the map-reduce path is used
+MAP_REDUCE_THRESHOLD = int(os.getenv("MAP_REDUCE_THRESHOLD_TOKENS", "12000"))
+CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "6000"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("SUMMARY_CHUNK_OVERLAP_TOKENS", "300"))
+MAX_CONCURRENCY = int(os.getenv("SUMMARY_CONCURRENCY", "4"))
+
+CHUNK_INSTRUCTION = (
+    "This is part {index} of {total} of a video transcription. Summarize it into "
+    "key points, keeping main ideas, important details and supporting evidence."
+)
+
+REDUCE_INSTRUCTION = (
+    "These are summaries of consecutive parts of one video transcription. Merge them "
+    "into a single coherent summary of key points, removing repetition between parts."
+)
+
+def split_transcript(text, chunk_tokens=CHUNK_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS):
+    """Split ``text`` into chunks of about ``chunk_tokens`` with ``overlap_tokens`` of overlap.
+
+    Cuts fall on sentence ends where possible, otherwise on whitespace.
+    """
+    max_chars = chunk_tokens * CHARS_PER_TOKEN
+    overlap_chars = min(overlap_tokens * CHARS_PER_TOKEN, max_chars // 2)
+    chunks, start = [], 0
+    while start < len(text):
+        end = min(start + max_chars, len(text))
+        if end < len(text):
+            window = text[start:end]
+            cut = max((m.end() for m in re.finditer(r"[.!?]\s", window)), default=0)
+            if cut < max_chars // 2:
+                cut = window.rfind(" ") + 1
+            if cut > 0:
+                end = start + cut
+        chunks.append(text[start:end].strip())
+        if end >= len(text):
+            break
+        start = max(end - overlap_chars, start + 1)
+    return [chunk for chunk in chunks if chunk]
+
+
+def map_reduce_summary(transcript, summarize, max_concurrency=MAX_CONCURRENCY,
+                       chunk_tokens=CHUNK_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS):
+    """Summarize a long ``transcript``; ``summarize(prompt)`` runs one model call.
+
+    ``summarize`` is called from several threads at once, so it must not share
+    per-run state (create a fresh agent per call).
+    """
+    chunks = split_transcript(transcript, chunk_tokens, overlap_tokens)
+    prompts = [
+        f"{CHUNK_INSTRUCTION.format(index=i + 1, total=len(chunks))}\n{chunk}"
+        for i, chunk in enumerate(chunks)
+    ]
+    with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+        partials = list(pool.map(summarize, prompts))
+
+    combined = "\n\n".join(
+        f"Part {i + 1}:\n{partial}" for i, partial in enumerate(partials) if partial
+    )
+    if not combined:
+        return ""
+    if estimate_tokens(combined) > chunk_tokens and len(combined) < len(transcript):
+        # Partial summaries still too long for one reduce prompt; reduce them in turn
+        return map_reduce_summary(combined, summarize, max_concurrency, chunk_tokens, overlap_tokens)
+    return summarize(f"{REDUCE_INSTRUCTION}\n{combined}")
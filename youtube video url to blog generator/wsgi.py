@@ -0,0 +1,25 @@
+"""Production entry point for the blog server.
+
+gunicorn (Linux/macOS):
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+waitress (any platform, single process, threaded):
+    python wsgi.py
+"""
+import os
+
+from server import create_app
+
+app = create_app()
+
+if __name__ == '__main__':
+    from waitress import serve
+
+    serve(
+        app,
+        host=os.getenv('HOST', '0.0.0.0'),
+        port=int(os.getenv('PORT', 5000)),
+        threads=int(os.getenv('THREADS', 8)),
+        # Idle time before an inactive connection is closed
+        channel_timeout=int(os.getenv('CHANNEL_TIMEOUT', 300)),
+    )